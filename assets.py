@@ -0,0 +1,128 @@
+import streamlit as st
+import os
+import re
+import hashlib
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+IMAGES_DIR = os.path.join(ROOT, "images")
+# Served by Streamlit at app/static/ when server.enableStaticServing is on.
+# Streamlit sends these files without a Cache-Control header; the names
+# change with the content, so a reverse proxy in front of the app should add
+# "Cache-Control: public, max-age=31536000, immutable" for app/static/.
+STATIC_DIR = os.path.join(ROOT, "static")
+STATIC_URL = "app/static"
+# Where the images were loaded from before they were served locally
+REMOTE_IMAGES_URL = "https://raw.githubusercontent.com/datjandra/kupuna/refs/heads/main/images"
+
+# Bundled images published as static assets, with the widest size they are shown at
+IMAGE_ASSETS = {
+    "hawaii.png": None,
+    "logo.png": 512,
+}
+
+CSS_STRING = r"""("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')"""
+
+def minify_css(css):
+    """
+    Strip comments and collapse whitespace, leaving quoted strings as they
+    are. Spaces go only around { } ; , and after a colon; a space before a
+    colon is kept, since ".grid :hover" and ".grid:hover" differ.
+    """
+    # Comments first, so quotes inside them are not taken for strings
+    css = re.sub(CSS_STRING + r"|/\*.*?\*/", lambda match: match.group(1) or "", css, flags=re.S)
+    parts = re.split(CSS_STRING, css)
+    # Even parts are outside quoted strings
+    for i in range(0, len(parts), 2):
+        text = re.sub(r"\s+", " ", parts[i])
+        text = re.sub(r" ?([{};,]) ?", r"\1", text)
+        parts[i] = text.replace(": ", ":").replace(";}", "}")
+    return "".join(parts).strip()
+
+def split_style_css(style_css):
+    """
+    Split the STYLE_CSS blob into the CSS inside its <style> tags and any
+    other markup it carries.
+    """
+    css = "\n".join(re.findall(r"<style[^>]*>(.*?)</style>", style_css, flags=re.S | re.I))
+    markup = re.sub(r"<style[^>]*>.*?</style>", "", style_css, flags=re.S | re.I).strip()
+    if not css and "<" not in style_css:
+        # A bare stylesheet without tags
+        return style_css, ""
+    return css, markup
+
+def _prune(stem, current):
+    # Earlier versions of an asset, e.g. style.<old hash>.css, are no longer linked
+    pattern = re.compile(re.escape(stem) + r"\.[0-9a-f]{12}\.\w+")
+    for file_name in os.listdir(STATIC_DIR):
+        if file_name != current and pattern.fullmatch(file_name):
+            try:
+                os.remove(os.path.join(STATIC_DIR, file_name))
+            except FileNotFoundError:
+                pass
+
+def _publish(name, data):
+    # Content-hashed file name, written once; existing files are never rewritten
+    stem, extension = os.path.splitext(name)
+    hashed = f"{stem}.{hashlib.sha256(data).hexdigest()[:12]}{extension}"
+    path = os.path.join(STATIC_DIR, hashed)
+    if not os.path.exists(path):
+        os.makedirs(STATIC_DIR, exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    _prune(stem, hashed)
+    return f"{STATIC_URL}/{hashed}"
+
+def _image_asset(name, max_width):
+    """
+    Return (file name, bytes) for a bundled image. Images with a display
+    width are scaled down to it, and opaque ones are re-encoded as JPEG.
+    """
+    path = os.path.join(IMAGES_DIR, name)
+    if max_width is None:
+        with open(path, "rb") as f:
+            return name, f.read()
+
+    from io import BytesIO
+    from PIL import Image
+
+    image = Image.open(path)
+    if image.width > max_width:
+        image = image.resize((max_width, image.height * max_width // image.width), Image.LANCZOS)
+    buffer = BytesIO()
+    if image.mode == "RGB":
+        image.save(buffer, "JPEG", quality=85, optimize=True)
+        name = os.path.splitext(name)[0] + ".jpg"
+    else:
+        image.save(buffer, "PNG", optimize=True)
+    return name, buffer.getvalue()
+
+@st.cache_resource
+def build_assets(style_css):
+    """
+    Publish the bundled images and the stylesheet under content-hashed
+    names in static/, once per process. Returns {name: url}. When static
+    serving is off the images keep their remote URLs and the CSS is
+    inlined instead.
+    """
+    if not st.get_option("server.enableStaticServing"):
+        return {name: f"{REMOTE_IMAGES_URL}/{name}" for name in IMAGE_ASSETS}
+
+    urls = {name: _publish(*_image_asset(name, max_width)) for name, max_width in IMAGE_ASSETS.items()}
+    css, _ = split_style_css(style_css or "")
+    if css.strip():
+        urls["style.css"] = _publish("style.css", minify_css(css).encode())
+    return urls
+
+@st.cache_resource
+def style_fragment(style_css):
+    """
+    The markup that applies STYLE_CSS: a link to the hashed stylesheet, or
+    the minified CSS inline when static serving is off.
+    """
+    css, markup = split_style_css(style_css or "")
+    url = build_assets(style_css).get("style.css")
+    if url:
+        return f'<link rel="stylesheet" href="{url}">{markup}'
+    return f"<style>{minify_css(css)}</style>{markup}" if css.strip() else markup
@@ -0,0 +1,196 @@
+import os
+import sys
+import time
+import threading
+import multiprocessing
+import bcrypt
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from database import get_user, add_user, set_password
+
+# bcrypt cost factor for new hashes; existing hashes are upgraded on login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# Processes that run bcrypt, and how many hashes may wait for them
+AUTH_WORKERS = int(os.getenv("AUTH_WORKERS", str(min(4, os.cpu_count() or 1))))
+AUTH_MAX_PENDING = int(os.getenv("AUTH_MAX_PENDING", "64"))
+AUTH_TIMEOUT = float(os.getenv("AUTH_TIMEOUT", "10"))
+# Failed logins allowed per username and per client address within the window
+LOGIN_USER_LIMIT = int(os.getenv("LOGIN_USER_LIMIT", "5"))
+LOGIN_IP_LIMIT = int(os.getenv("LOGIN_IP_LIMIT", "20"))
+LOGIN_WINDOW_SECONDS = float(os.getenv("LOGIN_WINDOW_SECONDS", "300"))
+
+class AuthBusyError(Exception):
+    pass
+
+class LoginThrottled(Exception):
+    def __init__(self, retry_after):
+        super().__init__(f"Too many failed logins. Try again in {int(retry_after) + 1} seconds.")
+        self.retry_after = retry_after
+
+class FailureCounter:
+    """
+    Sliding-window count of failed logins per key. A key is blocked once
+    it has limit failures within the last window seconds.
+    """
+    def __init__(self, limit, window):
+        self.limit = limit
+        self.window = window
+        self._lock = threading.Lock()
+        self._failures = {}
+
+    def _prune(self, key, now):
+        failures = self._failures.get(key)
+        while failures and failures[0] <= now - self.window:
+            failures.popleft()
+        if failures is not None and not failures:
+            del self._failures[key]
+            return None
+        return failures
+
+    def retry_after(self, key):
+        """
+        Seconds until key may try again, or 0 if it is not blocked.
+        """
+        now = time.monotonic()
+        with self._lock:
+            failures = self._prune(key, now)
+            if failures is None or len(failures) < self.limit:
+                return 0
+            return failures[-self.limit] + self.window - now
+
+    def record_failure(self, key):
+        now = time.monotonic()
+        with self._lock:
+            failures = self._prune(key, now)
+            if failures is None:
+                failures = self._failures[key] = deque()
+            failures.append(now)
+            # Only the newest limit failures decide when the key unblocks
+            while len(failures) > self.limit:
+                failures.popleft()
+
+    def reset(self, key):
+        with self._lock:
+            self._failures.pop(key, None)
+
+user_failures = FailureCounter(LOGIN_USER_LIMIT, LOGIN_WINDOW_SECONDS)
+ip_failures = FailureCounter(LOGIN_IP_LIMIT, LOGIN_WINDOW_SECONDS)
+
+# Run in the worker processes
+def _hash_password(password, rounds):
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds))
+
+def _check_password(password, password_hash):
+    return bcrypt.checkpw(password, password_hash)
+
+_pool = None
+_pool_lock = threading.Lock()
+_main_lock = threading.Lock()
+_pending = threading.BoundedSemaphore(AUTH_MAX_PENDING)
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Spawned rather than forked: the Streamlit server is multithreaded
+            _pool = ProcessPoolExecutor(AUTH_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+def _reset_pool(pool):
+    # A worker died; start a fresh pool for the next caller
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def _submit(pool, func, args):
+    # Workers are spawned on submit and import the __main__ module first.
+    # Streamlit installs the running page as __main__, so this module stands
+    # in for it; otherwise every new worker would run the page again.
+    with _main_lock:
+        main = sys.modules["__main__"]
+        sys.modules["__main__"] = sys.modules[__name__]
+        try:
+            return pool.submit(func, *args)
+        finally:
+            # Unless a new script run installed its own page meanwhile
+            if sys.modules["__main__"] is sys.modules[__name__]:
+                sys.modules["__main__"] = main
+
+def _run_batch(func, calls):
+    """
+    Run func once per tuple of arguments in calls, spread over the worker
+    pool. Raises AuthBusyError, a message the user can act on, when the
+    queue is full, the calls time out or the pool broke.
+    """
+    # Callers beyond the queue limit fail fast instead of piling up
+    if not _pending.acquire(blocking=False):
+        raise AuthBusyError("Too many logins in progress. Please try again.")
+    pool = _get_pool()
+    futures = []
+    try:
+        futures = [_submit(pool, func, args) for args in calls]
+        # Each worker takes its share of the batch one call at a time
+        deadline = time.monotonic() + AUTH_TIMEOUT * -(-len(futures) // AUTH_WORKERS)
+        return [future.result(timeout=max(0, deadline - time.monotonic())) for future in futures]
+    except FutureTimeoutError:
+        for future in futures:
+            future.cancel()
+        raise AuthBusyError("Login is taking longer than usual. Please try again.")
+    except BrokenProcessPool:
+        _reset_pool(pool)
+        raise AuthBusyError("Login is temporarily unavailable. Please try again.")
+    finally:
+        _pending.release()
+
+def _run(func, *args):
+    return _run_batch(func, [args])[0]
+
+def hash_password(password, rounds=None):
+    return _run(_hash_password, password.encode(), rounds or BCRYPT_ROUNDS)
+
+def hash_passwords(passwords, rounds=None):
+    """
+    Hash a batch of passwords across the worker processes.
+    """
+    rounds = rounds or BCRYPT_ROUNDS
+    return _run_batch(_hash_password, [(password.encode(), rounds) for password in passwords])
+
+def check_password(password, password_hash):
+    return _run(_check_password, password.encode(), password_hash)
+
+def hash_rounds(password_hash):
+    # "$2b$12$..." -> 12
+    return int(password_hash.split(b"$")[2])
+
+def authenticate(username, password, ip=None):
+    """
+    Return the user row if the password matches, otherwise None. Raises
+    LoginThrottled without hashing when the username or client address has
+    too many recent failures. Hashes with an outdated cost are replaced.
+    """
+    keys = [(user_failures, username)] + ([(ip_failures, ip)] if ip else [])
+    retry_after = max(failures.retry_after(key) for failures, key in keys)
+    if retry_after > 0:
+        raise LoginThrottled(retry_after)
+
+    user = get_user(username)
+    if user is None or not check_password(password, user["password"]):
+        for failures, key in keys:
+            failures.record_failure(key)
+        return None
+
+    user_failures.reset(username)
+    if hash_rounds(user["password"]) != BCRYPT_ROUNDS:
+        set_password(username, hash_password(password))
+    return user
+
+def register_user(username, password, role):
+    add_user(username, hash_password(password), role)
+
+def change_password(username, password):
+    set_password(username, hash_password(password))
@@ -0,0 +1,88 @@
+"""
+Bytes sent per rerun for the header, footer and sidebar logo, and the image
+bytes a cold browser downloads, before and after the static asset pipeline.
+
+Before: STYLE_CSS was emitted twice per rerun (header and footer) and the
+header image and logo were fetched from raw.githubusercontent.com. After: one
+<link> to a minified, content-hashed stylesheet, and local hashed images.
+
+Uses a synthetic stylesheet of about 20 KB when STYLE_CSS is not set.
+
+    python benchmarks/bench_assets.py
+"""
+import os
+import sys
+import shutil
+import tempfile
+import time
+
+from common import ROOT
+
+os.environ.setdefault("STREAMLIT_SERVER_ENABLE_STATIC_SERVING", "true")
+sys.path.insert(0, ROOT)
+
+RERUNS = 1000
+
+
+def sample_css():
+    rules = []
+    for i in range(200):
+        rules.append(f"""
+/* block {i} */
+.e{i}_section > .item-{i} {{
+    color : #{i:06x} ;
+    margin : {i % 7}px auto ;
+    font-family : "Helvetica Neue", Arial, sans-serif ;
+}}""")
+    return "<style>" + "".join(rules) + "\n</style>"
+
+
+def kb(n):
+    return f"{n / 1024:,.1f} KB"
+
+
+def main():
+    if not os.getenv("STYLE_CSS"):
+        os.environ["STYLE_CSS"] = sample_css()
+
+    import assets
+    static_dir = tempfile.mkdtemp(prefix="kupuna-static-")
+    assets.STATIC_DIR = static_dir
+    import style_helper
+
+    style_css = style_helper.STYLE_CSS
+    footer = """<div class="footer">
+    <p>© 2024 Kūpuna Care.</p>
+  </div>"""
+    before_rerun = 2 * len(style_css.encode()) + len(footer.encode())
+    before_images = sum(os.path.getsize(os.path.join(assets.IMAGES_DIR, name)) for name in assets.IMAGE_ASSETS)
+
+    start = time.perf_counter()
+    header = style_helper.header_fragment()
+    first = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(RERUNS):
+        style_helper.header_fragment()
+    cached = (time.perf_counter() - start) / RERUNS
+
+    urls = assets.build_assets(style_css)
+    # The header <div> markup is unchanged apart from the image URL
+    old_header = header[len(assets.style_fragment(style_css)):].replace(urls["hawaii.png"], f"{assets.REMOTE_IMAGES_URL}/hawaii.png")
+    before_rerun += len(old_header.encode())
+    after_rerun = len(header.encode()) + len(footer.encode())
+    after_images = sum(os.path.getsize(os.path.join(static_dir, os.path.basename(urls[name]))) for name in assets.IMAGE_ASSETS)
+    stylesheet = os.path.getsize(os.path.join(static_dir, os.path.basename(urls["style.css"])))
+
+    print(f"STYLE_CSS: {kb(len(style_css.encode()))}, minified stylesheet: {kb(stylesheet)}")
+    print(f"{'':24}{'before':>12}{'after':>12}")
+    print(f"{'markup per rerun':24}{kb(before_rerun):>12}{kb(after_rerun):>12}")
+    print(f"{'images, cold cache':24}{kb(before_images):>12}{kb(after_images):>12}")
+    print(f"{'third-party requests':24}{len(assets.IMAGE_ASSETS):>12}{0:>12}")
+    print(f"header fragment: first build {first * 1000:.1f} ms, reruns {cached * 1e6:.1f} us")
+    for name, url in urls.items():
+        print(f"  {name:12} -> {url}")
+    shutil.rmtree(static_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
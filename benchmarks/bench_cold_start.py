@@ -0,0 +1,72 @@
+"""
+Measure worker cold start: the old initialize_database body against
+migrate() + seed_database() on an already initialized database.
+
+    python benchmarks/bench_cold_start.py
+"""
+import csv
+import json
+import os
+import sqlite3
+import time
+import bcrypt
+
+from io import StringIO
+from common import setup_environment
+
+setup_environment()
+
+import database
+
+WORKERS = 5
+
+
+def legacy_initialize():
+    # The pre-migration startup path, as every new worker ran it
+    conn = sqlite3.connect(database.DB_PATH)
+    cursor = conn.cursor()
+    cursor.executescript(os.getenv("SCHEMA_SQL"))
+    for row in database._exercise_seed_rows(json.loads(os.getenv("EXERCISES"))):
+        cursor.execute(
+            "INSERT INTO exercises (mobility, length, phase, name, description, video) VALUES (?, ?, ?, ?, ?, ?)", row)
+    for row in csv.DictReader(StringIO(os.getenv("USERS"))):
+        try:
+            cursor.execute("INSERT INTO users (username, password, role) VALUES (?, ?, ?)",
+                           (row['username'], bcrypt.hashpw(row['password'].encode(), bcrypt.gensalt()), row['role']))
+        except sqlite3.IntegrityError:
+            continue
+    conn.commit()
+    conn.close()
+
+
+def seeded_initialize():
+    database.close_pool()
+    database.migrate()
+    database.seed_database()
+
+
+def measure(func):
+    timings = []
+    for _ in range(WORKERS):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def main():
+    legacy = measure(legacy_initialize)
+    with database.connection() as conn:
+        exercises = conn.execute("SELECT COUNT(*) FROM exercises").fetchone()[0]
+    print(f"legacy: first {legacy[0]:.1f} ms, warm workers {sum(legacy[1:]) / (WORKERS - 1):.1f} ms, "
+          f"{exercises} exercise rows after {WORKERS} starts")
+
+    seeded = measure(seeded_initialize)
+    with database.connection() as conn:
+        exercises = conn.execute("SELECT COUNT(*) FROM exercises").fetchone()[0]
+    print(f"seeded: first {seeded[0]:.1f} ms, warm workers {sum(seeded[1:]) / (WORKERS - 1):.1f} ms, "
+          f"{exercises} exercise rows after {WORKERS} starts")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Compare connection strategies the way Streamlit uses them: every rerun runs
+on a fresh script thread and issues a handful of reads.
+
+- open per query: the original connect, query, close
+- open per rerun: one connection per script thread (a thread-local pool)
+- process pool: database.connection(), shared by all threads
+
+Also counts how many connections each strategy opens.
+
+    python benchmarks/bench_connections.py
+"""
+import sqlite3
+import threading
+import time
+import pandas as pd
+
+from common import setup_environment
+
+setup_environment()
+
+import database
+
+RERUNS = 200
+QUERIES_PER_RERUN = 5
+ROUTINES_QUERY = "SELECT id, name, description, music FROM routines"
+
+opened = 0
+_open_connection = database.open_connection
+
+
+def counting_open(*args, **kwargs):
+    global opened
+    opened += 1
+    return _open_connection(*args, **kwargs)
+
+
+def open_per_query():
+    for _ in range(QUERIES_PER_RERUN):
+        conn = sqlite3.connect(database.DB_PATH)
+        pd.read_sql(ROUTINES_QUERY, conn)
+        conn.close()
+
+
+def open_per_rerun():
+    conn = counting_open()
+    for _ in range(QUERIES_PER_RERUN):
+        pd.read_sql(ROUTINES_QUERY, conn)
+    conn.close()
+
+
+def process_pool():
+    for _ in range(QUERIES_PER_RERUN):
+        with database.connection() as conn:
+            pd.read_sql(ROUTINES_QUERY, conn)
+
+
+def reruns(func):
+    # One fresh thread per rerun, as Streamlit's ScriptRunner does
+    global opened
+    opened = 0
+    start = time.perf_counter()
+    for _ in range(RERUNS):
+        thread = threading.Thread(target=func)
+        thread.start()
+        thread.join()
+    return (time.perf_counter() - start) * 1000 / RERUNS, opened
+
+
+def main():
+    database.open_connection = counting_open
+    database.migrate()
+    for i in range(20):
+        database.insert_routine(f"Routine {i}", "", "", [])
+
+    print(f"{RERUNS} reruns on fresh threads, {QUERIES_PER_RERUN} queries each")
+    for name, func in (("open per query", open_per_query), ("open per rerun", open_per_rerun), ("process pool", process_pool)):
+        ms, connections = reruns(func)
+        opens = f"{connections} connections opened" if func is not open_per_query else f"{RERUNS * QUERIES_PER_RERUN} connections opened"
+        print(f"{name:15} {ms:7.3f} ms/rerun, {opens}")
+
+
+if __name__ == "__main__":
+    main()
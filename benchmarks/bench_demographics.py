@@ -0,0 +1,78 @@
+"""
+Vectorized assign_demographics against the row-wise apply path.
+
+Times both on the same frame and compares the resulting race and name
+frequencies, which should agree within sampling noise.
+
+    python benchmarks/bench_demographics.py [rows]
+"""
+import sys
+import time
+import random
+import numpy as np
+import pandas as pd
+
+from common import setup_environment
+
+setup_environment()
+
+from ingest import (
+    assign_demographics, race_categories, ethnicity_mapping, race_to_name,
+    hispanic_caucasian_names, default_name,
+)
+
+
+# The row-wise functions assign_demographics replaced, kept as the baseline
+def assign_race_ethnicity(row):
+    race = random.choice(race_categories)
+    ethnicity = ethnicity_mapping[race]
+    return race, ethnicity
+
+
+def assign_name(row):
+    if row["MEM_RACE"] == "Caucasian" and row["MEM_ETHNICITY"] != 2:
+        race_names = hispanic_caucasian_names
+    else:
+        race_names = race_to_name.get(row["MEM_RACE"], {})
+    gender_names = race_names.get(row["MEM_GENDER"], [default_name])
+    return random.choice(gender_names)
+
+
+def members(rows):
+    genders = np.array(["M", "F", None], dtype=object)
+    return pd.DataFrame({"MEM_GENDER": genders[np.arange(rows) % 3], "MEM_AGE": 70})
+
+
+def row_wise(df):
+    df[["MEM_RACE", "MEM_ETHNICITY"]] = df.apply(assign_race_ethnicity, axis=1).apply(pd.Series)
+    df["NAME"] = df.apply(assign_name, axis=1)
+    return df
+
+
+def max_frequency_gap(a, b, column):
+    left = a[column].value_counts(normalize=True)
+    right = b[column].value_counts(normalize=True)
+    return left.subtract(right, fill_value=0).abs().max()
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    row_wise_rows = min(rows, 100_000)
+
+    start = time.perf_counter()
+    vectorized = assign_demographics(members(rows), np.random.default_rng(7))
+    vectorized_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    reference = row_wise(members(row_wise_rows))
+    row_wise_s = (time.perf_counter() - start) * rows / row_wise_rows
+
+    print(f"vectorized: {vectorized_s:.2f}s for {rows} rows")
+    print(f"row-wise:   {row_wise_s:.2f}s for {rows} rows (extrapolated from {row_wise_rows})")
+    print(f"speedup:    {row_wise_s / vectorized_s:.0f}x")
+    for column in ("MEM_RACE", "MEM_ETHNICITY", "NAME"):
+        print(f"max frequency gap in {column}: {max_frequency_gap(vectorized, reference, column):.4f}")
+
+
+if __name__ == "__main__":
+    main()
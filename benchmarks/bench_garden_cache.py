@@ -0,0 +1,88 @@
+"""
+Virtual Garden image cache: latency of a download against a cached read,
+the cache statistics, and LRU eviction under a small byte budget.
+
+A local HTTP server stands in for the image service and returns a PNG
+after a delay.
+
+    python benchmarks/bench_garden_cache.py [upstream delay seconds]
+"""
+import os
+import sys
+import time
+import threading
+
+from io import BytesIO
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from common import setup_environment
+
+DELAY = float(sys.argv[1]) if len(sys.argv) > 1 else 0.5
+GARDENS = [(sessions, streak) for sessions in range(0, 40, 4) for streak in range(5)]
+
+workdir = setup_environment()
+os.environ["GARDEN_MODE"] = "remote"
+os.environ["IMAGE_GEN_PROMPT"] = "garden with {total_sessions} flowers and {longest_streak} trees"
+os.environ["GARDEN_CACHE_DIR"] = os.path.join(workdir, "garden_cache")
+
+
+def sample_png():
+    from PIL import Image
+    buffer = BytesIO()
+    Image.new("RGB", (512, 512), (110, 170, 80)).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+PNG = sample_png()
+
+
+class SlowImageHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        time.sleep(DELAY)
+        self.send_response(200)
+        self.send_header("Content-Type", "image/png")
+        self.send_header("Content-Length", str(len(PNG)))
+        self.end_headers()
+        self.wfile.write(PNG)
+
+    def log_message(self, *args):
+        pass
+
+
+def timed_views(garden):
+    timings = []
+    for sessions, streak in GARDENS:
+        start = time.perf_counter()
+        data = garden.fetch_garden(sessions, streak)
+        timings.append(time.perf_counter() - start)
+        assert data == PNG
+    return sorted(timings)
+
+
+def main():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), SlowImageHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ["IMAGE_GEN_API"] = f"http://127.0.0.1:{server.server_port}/?prompt="
+
+    import garden
+
+    cold = timed_views(garden)
+    warm = timed_views(garden)
+    median = lambda timings: timings[len(timings) // 2] * 1000
+    print(f"{len(GARDENS)} gardens, upstream delay {DELAY}s, {len(PNG)} byte images")
+    print(f"first view (download) median {median(cold):8.1f} ms")
+    print(f"repeat view (disk)    median {median(warm):8.1f} ms  max {warm[-1] * 1000:.1f} ms")
+    print("stats:", garden.garden_cache.stats())
+
+    # Room for five images: older gardens are evicted, recent ones stay
+    small = garden.ImageCache(os.path.join(workdir, "small_cache"), max_bytes=5 * len(PNG))
+    for sessions, streak in GARDENS:
+        small.put(garden.garden_key(sessions, streak), PNG)
+    kept = [small.get(garden.garden_key(sessions, streak)) is not None for sessions, streak in GARDENS]
+    assert kept == [False] * (len(GARDENS) - 5) + [True] * 5, kept
+    print("eviction:", small.stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Background garden pre-rendering after logged sessions: duplicate requests
+share one job, downloads stay within the worker cap, and the next Virtual
+Garden view is served from the cache instead of waiting on the download.
+
+    python benchmarks/bench_garden_prerender.py [upstream delay seconds]
+"""
+import os
+import sys
+import time
+import datetime
+import threading
+
+from io import BytesIO
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from common import setup_environment
+
+DELAY = float(sys.argv[1]) if len(sys.argv) > 1 else 0.5
+PATIENTS = 10
+
+workdir = setup_environment()
+os.environ["GARDEN_MODE"] = "remote"
+os.environ["IMAGE_GEN_PROMPT"] = "garden with {total_sessions} flowers and {longest_streak} trees"
+os.environ["GARDEN_PRERENDER_WORKERS"] = "2"
+
+active = 0
+peak = 0
+requests_served = 0
+counter_lock = threading.Lock()
+
+
+def sample_png():
+    from PIL import Image
+    buffer = BytesIO()
+    Image.new("RGB", (64, 64), (110, 170, 80)).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+PNG = sample_png()
+
+
+class SlowImageHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        global active, peak, requests_served
+        with counter_lock:
+            active += 1
+            peak = max(peak, active)
+            requests_served += 1
+        time.sleep(DELAY)
+        with counter_lock:
+            active -= 1
+        self.send_response(200)
+        self.send_header("Content-Type", "image/png")
+        self.send_header("Content-Length", str(len(PNG)))
+        self.end_headers()
+        self.wfile.write(PNG)
+
+    def log_message(self, *args):
+        pass
+
+
+def main():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), SlowImageHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ["IMAGE_GEN_API"] = f"http://127.0.0.1:{server.server_port}/?prompt="
+
+    import database
+    import garden
+
+    database.initialize_database()
+    with database.transaction() as conn:
+        conn.execute("INSERT INTO routines (name, description, music) VALUES ('Daily', '', '')")
+        conn.executemany("INSERT INTO patients (name, age, gender, race) VALUES (?, 70, 'F', 'Japanese')",
+                         [(f"Patient {i}",) for i in range(PATIENTS)])
+
+    # Each patient logs a different number of sessions, so each needs its own garden
+    day = datetime.date(2024, 1, 1)
+    start = time.perf_counter()
+    futures = set()
+    for patient_id in range(1, PATIENTS + 1):
+        for offset in range(patient_id):
+            database.insert_exercise_log(patient_id, 1, str(day + datetime.timedelta(days=offset)), 30, 4)
+        # A caregiver double-clicking the button queues the same garden again
+        for _ in range(3):
+            futures.add(garden.prerender_garden(patient_id, 1))
+    queued = time.perf_counter() - start
+    futures.discard(None)
+    for future in futures:
+        future.result()
+    warm = time.perf_counter() - start
+
+    timings = []
+    for patient_id in range(1, PATIENTS + 1):
+        total_sessions, longest_streak = database.get_exercise_stats(patient_id, 1)
+        view = time.perf_counter()
+        garden.garden_image(total_sessions, longest_streak)
+        timings.append(time.perf_counter() - view)
+
+    print(f"{PATIENTS} patients logged, {3 * PATIENTS} prerender requests -> {len(futures)} jobs, "
+          f"{requests_served} downloads, peak concurrency {peak} (cap {garden.GARDEN_PRERENDER_WORKERS})")
+    print(f"logging and queueing took {queued * 1000:.0f} ms; gardens warm after {warm:.2f}s")
+    print(f"next garden views: max {max(timings) * 1000:.1f} ms (upstream delay {DELAY * 1000:.0f} ms)")
+    assert len(futures) == PATIENTS and requests_served == PATIENTS and peak <= garden.GARDEN_PRERENDER_WORKERS
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Local sprite garden: time for a full render, for one more flower on top
+of a memoized scene, and for a repeat view, plus a determinism check.
+Writes a sample garden to the temporary directory.
+
+    python benchmarks/bench_garden_render.py
+"""
+import os
+import time
+
+from common import setup_environment
+
+workdir = setup_environment()
+
+import garden
+
+
+def timed_ms(func):
+    start = time.perf_counter()
+    result = func()
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main():
+    garden._background()
+    for variant in range(len(garden.FLOWER_COLORS)):
+        garden.flower_sprite(variant)
+    garden.tree_sprite(0), garden.tree_sprite(1)
+
+    full = []
+    incremental = []
+    repeat = []
+    for patient_id in range(1, 21):
+        _, ms = timed_ms(lambda: garden.render_garden(patient_id, 120, 12))
+        full.append(ms)
+        _, ms = timed_ms(lambda: garden.render_garden(patient_id, 121, 12))
+        incremental.append(ms)
+        _, ms = timed_ms(lambda: garden.render_garden(patient_id, 121, 12))
+        repeat.append(ms)
+
+    median = lambda values: sorted(values)[len(values) // 2]
+    print(f"full render, 120 flowers 12 trees  median {median(full):6.2f} ms")
+    print(f"one more flower (incremental blit) median {median(incremental):6.2f} ms")
+    print(f"repeat view (memoized)             median {median(repeat):6.3f} ms")
+
+    # Same patient and stats give the same pixels, however the scene was reached
+    incremental_scene = garden.render_garden(7, 121, 12).tobytes()
+    garden._scenes.clear()
+    assert garden.render_garden(7, 121, 12).tobytes() == incremental_scene
+
+    path = os.path.join(workdir, "garden.png")
+    garden.render_garden(7, 40, 6).convert("RGB").save(path)
+    print("sample written to", path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Throughput and peak memory of streaming member ingestion as the extract grows.
+
+Writes synthetic Members/Enrollment CSVs and runs `python ingest.py` on each in
+a fresh process, so the reported peak RSS belongs to that run alone. Each
+extract is imported twice; the second run is an unchanged re-import.
+
+    python benchmarks/bench_ingest.py [rows ...]
+"""
+import csv
+import os
+import subprocess
+import sys
+
+from common import ROOT, setup_environment
+
+MEMBER_COLUMNS = ["PRIMARY_PERSON_KEY", "MEMBER_ID", "YEARMO", "MEM_AGE", "MEM_MSA_NAME"]
+ENROLLMENT_COLUMNS = ["PRIMARY_PERSON_KEY", "MEMBER_ID", "MEM_GENDER", "MEM_MSA_NAME", "MEM_STATE"]
+MONTHS = 12
+
+
+def write_extract(workdir, rows):
+    people = max(rows // MONTHS, 1)
+    members_path = os.path.join(workdir, f"members_{rows}.csv")
+    enrollment_path = os.path.join(workdir, f"enrollment_{rows}.csv")
+    with open(members_path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(MEMBER_COLUMNS)
+        for i in range(rows):
+            person = f"P{i % people:010d}"
+            writer.writerow([person, person, 202301 + i // people, 65 + i % 30, "HONOLULU"])
+    with open(enrollment_path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(ENROLLMENT_COLUMNS)
+        for i in range(people):
+            person = f"P{i:010d}"
+            writer.writerow([person, person, "MF"[i % 2], "HONOLULU", "HI"])
+    return members_path, enrollment_path
+
+
+def main():
+    workdir = setup_environment()
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 1_000_000]
+    for rows in sizes:
+        members_path, enrollment_path = write_extract(workdir, rows)
+        os.environ["DB_PATH"] = os.path.join(workdir, f"kupuna_{rows}.db")
+        for run in ("import", "re-import"):
+            result = subprocess.run(
+                [sys.executable, os.path.join(ROOT, "ingest.py"), members_path, enrollment_path],
+                capture_output=True, text=True, cwd=ROOT, env=os.environ,
+            )
+            summary = result.stdout.strip().splitlines()[-1] if result.returncode == 0 else result.stderr.strip()
+            print(f"{rows:>9} rows, {run}: {summary}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Logins per second when many sessions log in at once (shift change), with
+bcrypt on the script thread as before and through auth.authenticate, and
+the bcrypt work an attacker can cause by guessing passwords.
+
+    python benchmarks/bench_logins.py [sessions]
+
+BCRYPT_ROUNDS defaults to 10 here to keep the run short; hashes cost twice
+as much per extra round.
+"""
+import os
+import sys
+import threading
+import time
+
+from common import setup_environment
+
+setup_environment()
+os.environ.setdefault("BCRYPT_ROUNDS", "10")
+os.environ.setdefault("LOGIN_WINDOW_SECONDS", "60")
+
+import bcrypt
+import auth
+import database
+
+USERS = 64
+GUESSES = 200
+
+
+def run_sessions(sessions, target):
+    barrier = threading.Barrier(sessions)
+    results = [None] * sessions
+
+    def session(i):
+        barrier.wait()
+        results[i] = target(i)
+
+    threads = [threading.Thread(target=session, args=(i,)) for i in range(sessions)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, time.perf_counter() - start
+
+
+def inline_login(i):
+    # The previous login_page: cached lookup, then bcrypt on the script thread
+    user = database.get_user(f"caregiver{i % USERS}")
+    return user is not None and bcrypt.checkpw(b"password", user["password"])
+
+
+def service_login(i):
+    return auth.authenticate(f"caregiver{i % USERS}", "password", f"10.0.0.{i % 250}") is not None
+
+
+def main():
+    sessions = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+    database.migrate()
+    for i, password_hash in enumerate(auth.hash_passwords(["password"] * USERS)):
+        database.add_user(f"caregiver{i}", password_hash, "caregiver")
+    print(f"{sessions} concurrent sessions, bcrypt cost {auth.BCRYPT_ROUNDS}, "
+          f"{auth.AUTH_WORKERS} worker process(es) on {os.cpu_count()} CPU(s)")
+
+    for name, login in (("inline bcrypt", inline_login), ("auth service", service_login)):
+        login(0)
+        results, seconds = run_sessions(sessions, login)
+        assert all(results)
+        print(f"{name:14} {sessions / seconds:7.1f} logins/s ({seconds:.2f}s)")
+
+    # One client guessing one account's password
+    checks = 0
+    original = auth.check_password
+
+    def counted(password, password_hash):
+        nonlocal checks
+        checks += 1
+        return original(password, password_hash)
+
+    auth.check_password = counted
+    throttled = 0
+    start = time.perf_counter()
+    for guess in range(GUESSES):
+        try:
+            auth.authenticate("caregiver1", f"guess{guess}", "192.0.2.1")
+        except auth.LoginThrottled:
+            throttled += 1
+    seconds = time.perf_counter() - start
+    auth.check_password = original
+    print(f"{GUESSES} bad guesses: {checks} bcrypt checks (previously {GUESSES}), "
+          f"{throttled} throttled, {seconds:.2f}s")
+
+    # Other users keep logging in while that account is locked
+    results, seconds = run_sessions(sessions, lambda i: service_login(i + 2))
+    print(f"during lockout {sessions / seconds:7.1f} logins/s, {sum(results)}/{sessions} succeeded")
+
+
+if __name__ == "__main__":
+    main()
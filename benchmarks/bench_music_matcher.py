@@ -0,0 +1,62 @@
+"""
+Aho-Corasick catalog matching against the original per-title substring loop.
+
+Builds synthetic catalogs of 10k and 100k titles, checks both paths agree on
+a playlist text, and times one match call of each.
+
+    python benchmarks/bench_music_matcher.py
+"""
+import random
+import time
+
+from common import setup_environment
+
+setup_environment()
+
+from music import MusicMatcher, normalize_text
+
+WORDS = ["aloha", "moon", "river", "blue", "hawaii", "love", "song", "night", "star", "kaimana",
+         "hula", "sweet", "island", "wonderful", "world", "dream", "heart", "sea", "rain", "lei"]
+
+
+def make_catalog(size, rng):
+    catalog = {}
+    while len(catalog) < size:
+        title = " ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 5))).title()
+        title += f" ({len(catalog)})"
+        catalog[title] = f"vid{len(catalog):08d}"
+    return catalog
+
+
+def legacy_find(catalog, text):
+    # The original loop: normalize every title on every call
+    normalized = normalize_text(text)
+    return {title for title in catalog if normalize_text(title) in normalized}
+
+
+def main():
+    rng = random.Random(3)
+    for size in (10_000, 100_000):
+        catalog = make_catalog(size, rng)
+        picked = rng.sample(list(catalog), 10)
+        text = "\n".join(f"{i}. **{title}** - a favorite from the 1950s" for i, title in enumerate(picked, 1))
+
+        start = time.perf_counter()
+        matcher = MusicMatcher(catalog)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        matched = matcher.match(text)
+        match_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        legacy = legacy_find(catalog, text)
+        legacy_ms = (time.perf_counter() - start) * 1000
+
+        assert {title for title, _ in matched} == legacy
+        print(f"{size:>7} titles: build {build_ms:.0f} ms once, match {match_ms:.2f} ms "
+              f"vs legacy {legacy_ms:.1f} ms ({legacy_ms / match_ms:.0f}x), {len(matched)} matches")
+
+
+if __name__ == "__main__":
+    main()
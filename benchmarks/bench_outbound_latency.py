@@ -0,0 +1,83 @@
+"""
+Page latency with a slow upstream. A local HTTP server stands in for the
+image service and FakeModel for Gemini, both answering far slower than
+their latency budgets; the garden and playlist calls should still return
+within the budget, and at once after the circuit opens.
+
+    python benchmarks/bench_outbound_latency.py [requests] [upstream delay seconds]
+"""
+import os
+import sys
+import json
+import time
+import threading
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from common import setup_environment
+
+REQUESTS = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+DELAY = float(sys.argv[2]) if len(sys.argv) > 2 else 5.0
+
+workdir = setup_environment()
+os.environ["PLAYLIST_PROMPT"] = "Songs for a {age} year old {gender} {ethnicity} kupuna"
+os.environ["PLAYLIST_CACHE_PATH"] = os.path.join(workdir, "playlist_cache.db")
+os.environ["YOUTUBE_LINKS"] = json.dumps({"Aloha 'Oe": "a", "Moon River": "b", "Blue Hawaii": "c", "Pearly Shells": "d"})
+os.environ["GARDEN_MODE"] = "remote"
+os.environ["IMAGE_GEN_PROMPT"] = "garden with {total_sessions} flowers and {longest_streak} trees"
+os.environ.setdefault("PLAYLIST_TIMEOUT", "1")
+os.environ.setdefault("GARDEN_TIMEOUT", "1")
+
+
+class SlowHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        time.sleep(DELAY)
+        self.send_response(200)
+        self.send_header("Content-Type", "image/png")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    pick = lambda q: samples[min(int(q * len(samples)), len(samples) - 1)]
+    return f"p50 {pick(0.50) * 1000:7.1f} ms  p99 {pick(0.99) * 1000:7.1f} ms  max {samples[-1] * 1000:7.1f} ms"
+
+
+def measure(func):
+    samples = []
+    for i in range(REQUESTS):
+        start = time.perf_counter()
+        func(i)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def main():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), SlowHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ["IMAGE_GEN_API"] = f"http://127.0.0.1:{server.server_port}/?prompt="
+
+    import garden
+    import playlist
+
+    model = playlist.FakeModel(latency=DELAY)
+    playlist.get_model = lambda: model
+
+    print(f"upstream delay {DELAY}s, budgets: garden {garden.GARDEN_TIMEOUT}s, playlist {playlist.PLAYLIST_TIMEOUT}s")
+    samples = measure(lambda i: garden.garden_image(i, i % 7))
+    print(f"garden            {percentiles(samples)}  circuit {garden.garden_upstream.breaker.state}")
+    samples = measure(lambda i: playlist.generate_playlist(60 + i, "Kāne (Male)", "Hawaiian"))
+    print(f"playlist          {percentiles(samples)}  circuit {playlist.playlist_upstream.breaker.state}")
+    # Close the circuit again so the streaming path meets the slow model too
+    playlist.playlist_upstream.breaker.record_success()
+    samples = measure(lambda i: "".join(playlist.stream_playlist(60 + i, "Wahine (Female)", "Japanese")))
+    print(f"playlist stream   {percentiles(samples)}  circuit {playlist.playlist_upstream.breaker.state}")
+    print(f"model calls {model.calls} for {2 * REQUESTS} playlist requests")
+
+
+if __name__ == "__main__":
+    main()
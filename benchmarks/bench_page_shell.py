@@ -0,0 +1,97 @@
+"""
+Elements sent per rerun for the shared page shell (header, title, navigation
+cards, sidebar logo and footer), before and after the route table.
+
+Before: every page emitted the header, st.title, its own button-grid markdown
+and the sidebar logo as separate elements, and rebuilt the HTML each rerun.
+After: apply_page_shell() sends one element memoized per page and role.
+
+Runs each page of the route table through AppTest for every role, counts the
+elements the shell produces and the HTML bytes they carry, and times reruns.
+
+    python benchmarks/bench_page_shell.py
+"""
+import os
+import time
+import statistics
+
+from common import setup_environment
+
+workdir = setup_environment()
+os.environ.setdefault("STYLE_CSS", "<style>.button-grid { display: flex; }</style>")
+
+RERUNS = 20
+ROLES = ["coach", "caregiver", None]
+
+
+def before_shell(page):
+    import streamlit as st
+    from style_helper import PAGES, apply_header, apply_sidebar_logo, navigation_fragment
+
+    # The per-page code this replaces: HTML rebuilt and sent piece by piece
+    apply_header()
+    st.title(PAGES[page]["title"])
+    st.markdown(navigation_fragment(page, st.session_state.get("role")), unsafe_allow_html=True)
+    apply_sidebar_logo()
+
+
+def after_shell(page):
+    from style_helper import apply_page_shell
+
+    apply_page_shell(page)
+
+
+def walk(node):
+    yield node
+    children = getattr(node, "children", None)
+    if isinstance(children, dict):
+        children = children.values()
+    for child in children or []:
+        yield from walk(child)
+
+
+def measure(shell, page, role):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_function(shell, args=(page,), default_timeout=30)
+    at.session_state["role"] = role
+    at.run()
+    assert not at.exception, [e.value for e in at.exception]
+    elements = [node for node in walk(at._tree) if getattr(node, "proto", None) is not None and not hasattr(node, "children")]
+    size = sum(len(node.proto.SerializeToString()) for node in elements)
+
+    timings = []
+    for _ in range(RERUNS):
+        start = time.perf_counter()
+        at.run()
+        timings.append(time.perf_counter() - start)
+    return len(elements), size, statistics.median(timings)
+
+
+def main():
+    import assets
+    # Published assets go next to the temporary database, not into the repo
+    assets.STATIC_DIR = os.path.join(workdir, "static")
+    from style_helper import PAGES
+
+    totals = {"before": [0, 0, []], "after": [0, 0, []]}
+    print(f"{'page':20}{'role':>10}{'elements':>14}{'bytes':>16}")
+    for page in PAGES:
+        for role in ROLES:
+            row = {}
+            for name, shell in (("before", before_shell), ("after", after_shell)):
+                count, size, elapsed = measure(shell, page, role)
+                row[name] = (count, size)
+                totals[name][0] += count
+                totals[name][1] += size
+                totals[name][2].append(elapsed)
+            print(f"{page:20}{str(role):>10}{row['before'][0]:>7} -> {row['after'][0]:<4}{row['before'][1]:>7} -> {row['after'][1]:<6}")
+
+    runs = len(PAGES) * len(ROLES)
+    for name, (count, size, timings) in totals.items():
+        print(f"{name:7} {count / runs:.1f} elements, {size / runs:,.0f} bytes per rerun, "
+              f"median rerun {statistics.median(timings) * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
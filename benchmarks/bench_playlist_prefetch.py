@@ -0,0 +1,43 @@
+"""
+Throughput and error rate of the batch playlist prefetch against FakeModel.
+
+The stub model answers after a fixed latency and fails a share of calls, so
+the retries and the rate limiter are exercised.
+
+    python benchmarks/bench_playlist_prefetch.py
+"""
+import os
+import pandas as pd
+
+from common import setup_environment
+
+workdir = setup_environment()
+os.environ["PLAYLIST_PROMPT"] = "Songs for a {age} year old {gender} {ethnicity} kupuna"
+os.environ["PLAYLIST_CACHE_PATH"] = os.path.join(workdir, "playlist_cache.db")
+
+import playlist
+
+RACES = ["Caucasian", "Black", "Native Hawaiian or Pacific Islander", "Portuguese", "Filipino", "Japanese", "Chinese"]
+
+
+def patients(count):
+    return pd.DataFrame({
+        "age": [60 + i % 40 for i in range(count)],
+        "gender": ["MF"[i % 2] for i in range(count)],
+        "race": [RACES[i % len(RACES)] for i in range(count)],
+    })
+
+
+def main():
+    df = patients(5000)
+    for workers, rate in ((1, 1000.0), (8, 1000.0), (8, 20.0)):
+        playlist.playlist_cache = playlist.PlaylistCache(os.path.join(workdir, f"cache_{workers}_{rate}.db"))
+        model = playlist.FakeModel(latency=0.05, failure_rate=0.1)
+        report = playlist.prefetch_playlists(df, workers=workers, rate=rate, retries=2, backoff=0.01, model=model)
+        print(f"workers={workers} rate={rate:g}/s: {report['generated']} of {report['demographics']} demographics "
+              f"in {report['seconds']:.1f}s ({report['playlists_per_second']:.1f}/s), "
+              f"{model.calls} model calls, error rate {report['error_rate']:.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Time to first content for the blocking and streaming playlist paths.
+
+Uses FakeModel with a token schedule resembling a Gemini response: a delay
+before the first token, then a steady token rate.
+
+    python benchmarks/bench_playlist_streaming.py
+"""
+import os
+import time
+
+from common import setup_environment
+
+workdir = setup_environment()
+os.environ["PLAYLIST_PROMPT"] = "Songs for a {age} year old {gender} {ethnicity} kupuna"
+os.environ["PLAYLIST_CACHE_PATH"] = os.path.join(workdir, "playlist_cache.db")
+
+import playlist
+
+from music import MusicMatcher, MusicScanner
+
+TITLES = ["Aloha 'Oe", "Moon River", "What a Wonderful World", "Blue Hawaii", "Pearly Shells", "Tiny Bubbles"]
+
+
+def main():
+    model = playlist.FakeModel(titles=TITLES, latency=0.4, token_delay=0.05, size=30)
+    playlist.get_model = lambda: model
+    matcher = MusicMatcher({title: f"vid{i}" for i, title in enumerate(TITLES)})
+
+    start = time.perf_counter()
+    text = model.generate_content("request").text
+    blocking = time.perf_counter() - start
+    matcher.match(text)
+
+    start = time.perf_counter()
+    first_token = first_video = None
+    scanner = MusicScanner(matcher)
+    for chunk in playlist.stream_playlist(70, "Wahine (Female)", "Japanese"):
+        first_token = first_token or time.perf_counter() - start
+        if scanner.feed(chunk) and first_video is None:
+            first_video = time.perf_counter() - start
+    streamed = time.perf_counter() - start
+
+    print(f"blocking:  first content after {blocking:.2f}s")
+    print(f"streaming: first token after {first_token:.2f}s, first video after {first_video:.2f}s, "
+          f"complete after {streamed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Local music recommender: index build time and time per recommendation
+for synthetic tagged catalogs, plus a check that every recommendation
+has a video in the catalog.
+
+    python benchmarks/bench_recommender.py
+"""
+import random
+import time
+
+from common import setup_environment, timed
+
+setup_environment()
+
+from music import MusicRecommender, DEFAULT_ETHNICITY_TAGS
+
+GENRES = ["pop", "jazz", "country", "hawaiian", "soul", "motown", "enka", "fado", "opm", "gospel", "folk", "big band"]
+ORIGINS = ["american", "hawaiian", "japanese", "filipino", "portuguese", "chinese", "pacific"]
+PROFILES = [(age, gender, ethnicity) for age in (62, 75, 88) for gender in ("Kāne (Male)", "Wahine (Female)")
+            for ethnicity in ("Japanese", "Filipino", "Native Hawaiian or Pacific Islander", "Caucasian")]
+
+
+def make_catalog(size, rng):
+    catalog = {}
+    tags = {}
+    for i in range(size):
+        title = f"Song {i}"
+        catalog[title] = f"vid{i:08d}"
+        tags[title] = {
+            "era": rng.randrange(1920, 2020),
+            "genre": rng.sample(GENRES, rng.randint(1, 2)),
+            "origin": rng.choice(ORIGINS),
+        }
+    return catalog, tags
+
+
+def main():
+    rng = random.Random(5)
+    for size in (100, 10_000, 100_000):
+        catalog, tags = make_catalog(size, rng)
+        start = time.perf_counter()
+        recommender = MusicRecommender(catalog, tags, DEFAULT_ETHNICITY_TAGS)
+        build = time.perf_counter() - start
+
+        for profile in PROFILES:
+            for title, video_id in recommender.recommend(*profile, size=10):
+                assert catalog[title] == video_id
+
+        per_call = timed(lambda: [recommender.recommend(*profile, size=10) for profile in PROFILES], 20) / len(PROFILES)
+        print(f"{size:>7} songs: build {build * 1000:8.1f} ms, recommend {per_call * 1000:8.1f} us")
+
+    age, gender, ethnicity = PROFILES[0]
+    print(f"top 5 for {age} {ethnicity}:", [(title, tags[title]["era"], tags[title]["genre"], tags[title]["origin"])
+                                          for title, _ in recommender.recommend(age, gender, ethnicity, 5)])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Per-rerun data work of the View Routines page with thousands of routines:
+the old path (fetch_routines, a format_func that filters the DataFrame per
+option, get_exercises_for_routine and a Categorical sort) against the
+routine catalog (id lookups on a structure loaded with one query).
+
+Both paths are timed with their caches warm, as on a rerun after the first.
+
+    python benchmarks/bench_routine_catalog.py [routines ...]
+"""
+import sys
+import time
+import pandas as pd
+
+from common import setup_environment, timed
+
+setup_environment()
+
+import database
+
+EXERCISES_PER_ROUTINE = 9
+PHASES = ["Cool-Down and Closing", "Warm-Up", "Movements"]
+
+
+def populate(routines):
+    with database.transaction() as conn:
+        conn.execute("DELETE FROM routine_exercises")
+        conn.execute("DELETE FROM routines")
+        conn.execute("DELETE FROM exercises")
+        conn.executemany(
+            "INSERT INTO exercises (id, mobility, length, phase, name, description, video) VALUES (?, 'Low', '30 minutes', ?, ?, '', '')",
+            [(i, PHASES[i % len(PHASES)], f"Exercise {i}") for i in range(1, 101)])
+        conn.executemany(
+            "INSERT INTO routines (id, name, description, music) VALUES (?, ?, '', '')",
+            [(i, f"Routine {i}") for i in range(1, routines + 1)])
+        conn.executemany(
+            "INSERT INTO routine_exercises (routine_id, exercise_id) VALUES (?, ?)",
+            [(i, (i * 7 + j) % 100 + 1) for i in range(1, routines + 1) for j in range(EXERCISES_PER_ROUTINE)])
+        database.bump_generations(conn, "routines", "routine_exercises", "exercises")
+
+
+def old_rerun(routine_id):
+    routines = database.fetch_routines()
+    labels = [routines.loc[routines["id"] == rid, "name"].values[0] for rid in routines["id"]]
+    routine_details = routines.loc[routines["id"] == routine_id].iloc[0]
+    exercises = database.get_exercises_for_routine(routine_id)
+    exercises["phase"] = pd.Categorical(exercises["phase"], categories=database.PHASE_ORDER, ordered=True)
+    return labels, routine_details, exercises.sort_values("phase")
+
+
+def new_rerun(routine_id):
+    catalog = database.get_routine_catalog()
+    labels = [catalog.name(rid) for rid in catalog.ids]
+    routine_details = catalog[routine_id]
+    return labels, routine_details, pd.DataFrame(routine_details["exercises"])
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [100, 1000, 3000]
+    database.migrate()
+    print(f"{'routines':>9}{'old rerun':>14}{'catalog rerun':>16}{'detail only':>14}{'catalog load':>15}")
+    for size in sizes:
+        populate(size)
+        routine_id = size // 2
+
+        start = time.perf_counter()
+        catalog = database.get_routine_catalog()
+        load = (time.perf_counter() - start) * 1000
+        assert len(catalog) == size
+        assert [e["phase"] for e in catalog[routine_id]["exercises"]] == sorted(
+            (e["phase"] for e in catalog[routine_id]["exercises"]), key=database.PHASE_ORDER.index)
+
+        repeat = max(3, 3000 // size)
+        old_rerun(routine_id)
+        old_ms = timed(lambda: old_rerun(routine_id), repeat)
+        new_ms = timed(lambda: new_rerun(routine_id), repeat * 10)
+        # The selected routine alone, without labelling every option
+        detail_ms = timed(lambda: database.get_routine_catalog()[routine_id], 1000)
+        print(f"{size:>9}{old_ms:>11.2f} ms{new_ms:>13.3f} ms{detail_ms:>11.3f} ms{load:>12.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
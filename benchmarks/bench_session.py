@@ -0,0 +1,41 @@
+"""
+Cost of restoring a signed-in user after a reload or page link: one HMAC
+check of the session token, against logging in again with bcrypt.
+
+    python benchmarks/bench_session.py
+"""
+import os
+import time
+
+from common import setup_environment, timed
+
+setup_environment()
+os.environ.setdefault("SESSION_SECRET", "bench")
+
+import bcrypt
+
+from session import issue_token, verify_token
+
+REPEAT = 20000
+
+
+def main():
+    token = issue_token(1, "deb", "caregiver")
+    tampered = token[:-4] + "AAAA"
+    assert verify_token(token)["role"] == "caregiver"
+    assert verify_token(tampered) is None
+
+    print(f"token: {len(token)} bytes")
+    print(f"issue_token      {timed(lambda: issue_token(1, 'deb', 'caregiver'), REPEAT) * 1000:8.1f} us")
+    print(f"verify_token     {timed(lambda: verify_token(token), REPEAT) * 1000:8.1f} us")
+    print(f"verify tampered  {timed(lambda: verify_token(tampered), REPEAT) * 1000:8.1f} us")
+
+    for rounds in (10, 12):
+        password_hash = bcrypt.hashpw(b"password", bcrypt.gensalt(rounds))
+        start = time.perf_counter()
+        bcrypt.checkpw(b"password", password_hash)
+        print(f"bcrypt cost {rounds:2}   {(time.perf_counter() - start) * 1e6:8.1f} us (a fresh login)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Concurrency check for request coalescing: N sessions asking for the same
+playlist at the same moment should produce one upstream model call, on
+both the blocking and the streaming path.
+
+    python benchmarks/bench_single_flight.py [sessions]
+"""
+import os
+import sys
+import threading
+import time
+
+from common import setup_environment
+
+workdir = setup_environment()
+os.environ["PLAYLIST_PROMPT"] = "Songs for a {age} year old {gender} {ethnicity} kupuna"
+os.environ["PLAYLIST_CACHE_PATH"] = os.path.join(workdir, "playlist_cache.db")
+
+import playlist
+
+from outbound import single_flight
+
+TITLES = ["Aloha 'Oe", "Moon River", "What a Wonderful World", "Blue Hawaii", "Pearly Shells"]
+
+
+def run_sessions(sessions, target):
+    barrier = threading.Barrier(sessions)
+    results = [None] * sessions
+
+    def session(i):
+        barrier.wait()
+        results[i] = target()
+
+    threads = [threading.Thread(target=session, args=(i,)) for i in range(sessions)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, time.perf_counter() - start
+
+
+def main():
+    sessions = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+    model = playlist.FakeModel(titles=TITLES, latency=0.5, token_delay=0.01, size=20)
+    playlist.get_model = lambda: model
+
+    results, seconds = run_sessions(sessions, lambda: playlist.fetch_playlist(70, "Kāne (Male)", "Hawaiian"))
+    print(f"blocking:  {sessions} sessions, {model.calls} model call(s), "
+          f"{len(set(results))} distinct result(s), {seconds:.2f}s")
+    assert model.calls == 1
+
+    results, seconds = run_sessions(sessions, lambda: "".join(playlist.stream_playlist(80, "Wahine (Female)", "Japanese")))
+    print(f"streaming: {sessions} sessions, {model.calls - 1} model call(s), "
+          f"{len(set(results))} distinct result(s), {seconds:.2f}s")
+    assert model.calls == 2
+
+    print("single flight:", single_flight.stats())
+
+
+if __name__ == "__main__":
+    main()
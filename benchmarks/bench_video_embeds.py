@@ -0,0 +1,108 @@
+"""
+Page weight and render time of the routine pages on a 50-exercise routine,
+with every video embedded (LAZY_VIDEOS=false) and with click-to-load
+thumbnails (the default).
+
+Counts the YouTube players the page creates on load, the size of the page
+elements sent to the browser, and the server-side render time per rerun.
+
+    python benchmarks/bench_video_embeds.py
+"""
+import os
+import sys
+import json
+import time
+import statistics
+import subprocess
+
+from common import ROOT, setup_environment
+
+EXERCISES = 50
+RERUNS = 5
+PHASES = ["Warm-Up", "Movements", "Cool-Down and Closing"]
+
+
+def exercise_data():
+    phases = {phase: [] for phase in PHASES}
+    for i in range(EXERCISES):
+        phases[PHASES[i % len(PHASES)]].append({
+            "name": f"Exercise {i}",
+            "description": f"Step by step instructions for exercise {i}.",
+            "video": f"https://www.youtube.com/watch?v={i:011d}",
+        })
+    return {"Low": {"60 minutes": phases}}
+
+
+def walk(node):
+    yield node
+    children = getattr(node, "children", None)
+    if isinstance(children, dict):
+        children = children.values()
+    for child in children or []:
+        yield from walk(child)
+
+
+def measure_page(page):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(os.path.join(ROOT, "pages", page), default_timeout=120)
+    at.session_state["role"] = "coach"
+    timings = []
+    for _ in range(RERUNS):
+        start = time.perf_counter()
+        at.run()
+        timings.append(time.perf_counter() - start)
+    assert not at.exception, [e.value for e in at.exception]
+
+    players = cards = payload = 0
+    for node in walk(at._tree):
+        proto = getattr(node, "proto", None)
+        if proto is None or not hasattr(proto, "SerializeToString"):
+            continue
+        data = proto.SerializeToString()
+        payload += len(data)
+        # st.video and st_player both create a YouTube iframe in the browser
+        if node.type == "video" or (node.type == "component_instance" and b'"url": "https://www.youtube.com' in data):
+            players += 1
+        elif node.type == "html":
+            cards += data.count(b'class="video-card"')
+    return {"players": players, "cards": cards, "payload": payload, "render": statistics.median(timings)}
+
+
+def run_mode():
+    workdir = setup_environment()
+    os.environ["EXERCISES"] = json.dumps(exercise_data())
+    os.environ.setdefault("STYLE_CSS", "<style></style>")
+    os.chdir(ROOT)
+
+    import database
+    database.initialize_database()
+    with database.connection() as conn:
+        exercise_ids = [row[0] for row in conn.execute("SELECT id FROM exercises ORDER BY id")]
+    database.insert_routine("Long routine", "Every exercise", "", exercise_ids)
+    # Stored metadata, so nothing is looked up over the network
+    database.upsert_video_metadata([(f"{i:011d}", f"Video {i}", 60 + i, f"https://i.ytimg.com/vi/{i:011d}/hqdefault.jpg")
+                                    for i in range(EXERCISES)])
+
+    results = {page: measure_page(page) for page in ("exercise_routines.py", "create_routine.py")}
+    print(json.dumps(results))
+
+
+def main():
+    if sys.argv[1:] == ["--mode"]:
+        run_mode()
+        return
+
+    print(f"{EXERCISES}-exercise routine, median of {RERUNS} reruns")
+    for lazy in ("false", "true"):
+        env = dict(os.environ, LAZY_VIDEOS=lazy)
+        output = subprocess.run([sys.executable, __file__, "--mode"], env=env, capture_output=True, text=True, check=True)
+        results = json.loads(output.stdout.strip().splitlines()[-1])
+        label = "click-to-load" if lazy == "true" else "eager players"
+        for page, result in results.items():
+            print(f"{label:14} {page:22} players on load {result['players']:3}  thumbnails {result['cards']:3}  "
+                  f"elements {result['payload'] / 1024:7.1f} KiB  render {result['render'] * 1000:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Check that the hot-path queries are index-driven on a large database.
+
+Loads 1M exercise_logs rows, runs ANALYZE and fails if EXPLAIN QUERY PLAN
+reports a full table scan for any of the queries. fetch_patient_routines lists
+every assignment, so it may walk patient_routines once, but the joined
+patients and routines must be looked up by key. get_routine_catalog likewise
+walks routines once and looks up their exercises by key.
+
+    python benchmarks/check_query_plans.py [rows]
+"""
+import sys
+
+from common import setup_environment
+
+setup_environment()
+
+import database
+
+PATIENTS = 2000
+ROUTINES = 200
+
+
+def populate(rows):
+    with database.transaction() as conn:
+        conn.execute(
+            "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < ?) "
+            "INSERT INTO patients (name, age, gender, race) SELECT 'Kupuna ' || i, 70, 'F', 'Japanese' FROM n",
+            (PATIENTS,))
+        conn.execute(
+            "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < ?) "
+            "INSERT INTO routines (name, description, music) SELECT 'Routine ' || i, '', '' FROM n",
+            (ROUTINES,))
+        conn.execute(
+            "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < ?) "
+            "INSERT INTO patient_routines (patient_id, routine_id) SELECT i, i % ? + 1 FROM n",
+            (PATIENTS, ROUTINES))
+        conn.execute(
+            "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < ?) "
+            "INSERT INTO exercise_logs (patient_id, routine_id, date_time, duration_minutes, mood_level) "
+            "SELECT i % ? + 1, i % ? + 1, date('2020-01-01', '+' || (i / ?) || ' days'), 30, i % 5 + 1 FROM n",
+            (rows, PATIENTS, ROUTINES, PATIENTS))
+        conn.execute(
+            "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < ?) "
+            "INSERT INTO routine_exercises (routine_id, exercise_id) SELECT i % ? + 1, i FROM n",
+            (ROUTINES * 3, ROUTINES))
+    with database.connection() as conn:
+        conn.execute("ANALYZE")
+
+
+def full_scans(query, params, allowed=()):
+    with database.connection() as conn:
+        plan = conn.execute(f"EXPLAIN QUERY PLAN {query}", params).fetchall()
+    details = [row[-1] for row in plan]
+    scans = [d for d in details if d.startswith("SCAN") and "INDEX" not in d]
+    return details, [d for d in scans if d.split()[1] not in allowed]
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    database.migrate()
+    populate(rows)
+
+    checks = {
+        "fetch_patient_routines": (database.PATIENT_ROUTINES_QUERY, (), ("pr",)),
+        "fetch_exercise_logs": (database.EXERCISE_LOGS_QUERY, (1, 1), ()),
+        "get_exercise_stats": (database.EXERCISE_STATS_QUERY, (1, 1), ()),
+        "get_exercises_for_routine": (database.ROUTINE_EXERCISES_QUERY, (1,), ()),
+        "get_routine_catalog": (database.ROUTINE_CATALOG_QUERY, (), ("r",)),
+    }
+    failed = False
+    for name, (query, params, allowed) in checks.items():
+        details, scans = full_scans(query, params, allowed)
+        status = "FULL SCAN" if scans else "ok"
+        failed = failed or bool(scans)
+        print(f"{name}: {status}")
+        for detail in details:
+            print(f"    {detail}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
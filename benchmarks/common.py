@@ -0,0 +1,80 @@
+"""
+Shared setup for the benchmark scripts.
+
+Benchmarks run against a throwaway database in a temporary directory. When the
+deployment environment variables are not set, a sample schema and seed data are
+used so the scripts can run offline.
+"""
+import os
+import sys
+import json
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SAMPLE_SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS exercises (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    mobility TEXT, length TEXT, phase TEXT, name TEXT, description TEXT, video TEXT
+);
+CREATE TABLE IF NOT EXISTS routines (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL, description TEXT, music TEXT
+);
+CREATE TABLE IF NOT EXISTS routine_exercises (
+    routine_id INTEGER, exercise_id INTEGER
+);
+CREATE TABLE IF NOT EXISTS patients (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT, age INTEGER, gender TEXT, race TEXT
+);
+CREATE TABLE IF NOT EXISTS patient_routines (
+    patient_id INTEGER, routine_id INTEGER,
+    UNIQUE (patient_id, routine_id)
+);
+CREATE TABLE IF NOT EXISTS exercise_logs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    patient_id INTEGER, routine_id INTEGER, date_time TEXT,
+    duration_minutes INTEGER, mood_level INTEGER, comments TEXT
+);
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT UNIQUE, password TEXT, role TEXT
+);
+"""
+
+SAMPLE_EXERCISES = {
+    "Low": {
+        "15 minutes": {
+            "Warm-Up": [{"name": "Seated Breathing", "description": "Slow breaths.", "video": "https://www.youtube.com/watch?v=aaaaaaaaaaa"}],
+            "Movements": [{"name": "Arm Circles", "description": "Small circles.", "video": "https://www.youtube.com/watch?v=bbbbbbbbbbb"}],
+            "Cool-Down and Closing": [{"name": "Gentle Stretch", "description": "Reach up.", "video": "https://www.youtube.com/watch?v=ccccccccccc"}],
+        }
+    }
+}
+
+SAMPLE_USERS = "username,password,role\ndon,password,coach\ndeb,password,caregiver\n"
+
+
+def setup_environment():
+    """
+    Point DB_PATH at a fresh temporary database and fill in sample settings.
+    Must be called before importing any module from the repository.
+    """
+    workdir = tempfile.mkdtemp(prefix="kupuna-bench-")
+    os.environ["DB_PATH"] = os.path.join(workdir, "kupuna.db")
+    os.environ.setdefault("SCHEMA_SQL", SAMPLE_SCHEMA_SQL)
+    os.environ.setdefault("EXERCISES", json.dumps(SAMPLE_EXERCISES))
+    os.environ.setdefault("USERS", SAMPLE_USERS)
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    return workdir
+
+
+def timed(func, repeat):
+    # Return the mean wall time of func in milliseconds
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) * 1000 / repeat
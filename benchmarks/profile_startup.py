@@ -0,0 +1,111 @@
+"""
+Startup profile for every page: the modules each page imports on its first
+render in a fresh worker, with their cumulative import times from
+`python -X importtime`, and the first-render time.
+
+Each page runs in its own interpreter, after Streamlit itself has been
+imported, so only the page's own imports are counted. Writes a Markdown
+report and prints the summary table.
+
+    python benchmarks/profile_startup.py [report path]
+"""
+import os
+import sys
+import json
+import time
+import subprocess
+
+from common import ROOT, setup_environment
+
+PAGES = ["login.py"] + sorted(f"pages/{name}" for name in os.listdir(os.path.join(ROOT, "pages")) if name.endswith(".py"))
+MARKER = "# page imports start"
+TOP_IMPORTS = 8
+
+
+def run_page(page):
+    # Runs inside the child interpreter started with -X importtime
+    setup_environment()
+    os.environ.setdefault("STYLE_CSS", "<style></style>")
+    os.environ.setdefault("GEM_MODEL", "fake")
+    os.environ.setdefault("PLAYLIST_PROMPT", "Songs for a {age} year old {gender} {ethnicity} kupuna")
+    os.environ.setdefault("YOUTUBE_LINKS", json.dumps({"Moon River": "aaaaaaaaaaa"}))
+    os.chdir(ROOT)
+
+    from streamlit.testing.v1 import AppTest
+    import database
+    database.initialize_database()
+
+    at = AppTest.from_file(os.path.join(ROOT, page), default_timeout=120)
+    at.session_state["role"] = "coach"
+    print(MARKER, file=sys.stderr, flush=True)
+    start = time.perf_counter()
+    at.run()
+    render = time.perf_counter() - start
+    print(json.dumps({"render": render, "errors": [str(e.value) for e in at.exception]}))
+
+
+def parse_importtime(stderr):
+    """
+    Return [(cumulative microseconds, module)] for the top-level imports
+    after the marker, i.e. the ones the page itself triggered.
+    """
+    imports = []
+    started = False
+    for line in stderr.splitlines():
+        if line.startswith(MARKER):
+            started = True
+            continue
+        if not started or not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line.split("|", 2)
+        # Nested imports are indented by two spaces per level after the first space
+        if not name[1:].startswith(" "):
+            imports.append((int(cumulative_us), name.strip()))
+    return imports
+
+
+def profile_page(page):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", __file__, "--page", page],
+        capture_output=True, text=True, cwd=ROOT,
+    )
+    if result.returncode:
+        raise RuntimeError(f"{page} failed:\n{result.stderr[-2000:]}")
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    imports = parse_importtime(result.stderr)
+    report["import"] = sum(us for us, _ in imports) / 1e6
+    report["top"] = sorted(imports, reverse=True)[:TOP_IMPORTS]
+    return report
+
+
+def write_report(path, results):
+    lines = ["# Page startup profile", "",
+             "Fresh interpreter per page; times exclude importing Streamlit itself.", "",
+             "| Page | Imports (ms) | First render (ms) |", "| --- | ---: | ---: |"]
+    for page, report in results.items():
+        lines.append(f"| {page} | {report['import'] * 1000:.0f} | {report['render'] * 1000:.0f} |")
+    for page, report in results.items():
+        lines += ["", f"## {page}", "", "| Module | Cumulative (ms) |", "| --- | ---: |"]
+        lines += [f"| {name} | {us / 1000:.1f} |" for us, name in report["top"]]
+        if report["errors"]:
+            lines += ["", "Errors: " + "; ".join(report["errors"])]
+    with open(path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def main():
+    if sys.argv[1:2] == ["--page"]:
+        run_page(sys.argv[2])
+        return
+
+    path = sys.argv[1] if len(sys.argv) > 1 else "startup_report.md"
+    results = {page: profile_page(page) for page in PAGES}
+    print(f"{'page':32} {'imports':>10} {'first render':>14}")
+    for page, report in results.items():
+        print(f"{page:32} {report['import'] * 1000:8.0f} ms {report['render'] * 1000:11.0f} ms")
+    write_report(path, results)
+    print(f"report written to {path}")
+
+
+if __name__ == "__main__":
+    main()
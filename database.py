@@ -4,75 +4,508 @@ import os
 import json
 import sqlite3
 import csv
-import bcrypt
+import hashlib
+import queue
+import threading
 
 from io import StringIO
 from collections import defaultdict
-from datetime import datetime
+from contextlib import contextmanager
+
+DB_PATH = os.getenv("DB_PATH", "kupuna.db")
+BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+
+# Applied to every pooled connection when it is opened
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-16000",
+    "PRAGMA mmap_size=134217728",
+)
+
+# Entries per cached read helper; superseded generations age out
+CACHE_MAX_ENTRIES = 256
+USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL", "300"))
+
+# Idle connections kept open per process. Streamlit runs every rerun on a new
+# thread, so connections are shared by the process rather than owned by a thread.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+
+# Hot-path queries; benchmarks/check_query_plans.py verifies they are index-driven
+PATIENT_ROUTINES_QUERY = """
+    SELECT pr.patient_id, pr.routine_id, p.name AS patient_name, r.name AS routine_name
+    FROM patient_routines pr
+    JOIN patients p ON pr.patient_id = p.id
+    JOIN routines r ON pr.routine_id = r.id
+    """
+
+EXERCISE_LOGS_QUERY = """
+    SELECT date_time, duration_minutes, mood_level
+    FROM exercise_logs
+    WHERE patient_id = ? AND routine_id = ?
+    ORDER BY date_time
+    """
+
+EXERCISE_STATS_QUERY = """
+    SELECT total_sessions, longest_streak
+    FROM exercise_stats
+    WHERE patient_id = ? AND routine_id = ?
+    """
+
+# Gaps-and-islands: every session that is not exactly one day after the previous
+# one starts a new island, and the running count of island starts numbers them.
+# A repeated date breaks the streak, matching the original Python streak walk.
+EXERCISE_STATS_REBUILD_SQL = """
+    WITH days AS (
+        SELECT patient_id, routine_id, date(date_time) AS day,
+               julianday(date(date_time)) - julianday(LAG(date(date_time)) OVER (
+                   PARTITION BY patient_id, routine_id ORDER BY date(date_time)
+               )) AS gap
+        FROM exercise_logs
+        {where}
+    ),
+    numbered AS (
+        SELECT patient_id, routine_id, day,
+               SUM(CASE WHEN gap = 1 THEN 0 ELSE 1 END) OVER (
+                   PARTITION BY patient_id, routine_id ORDER BY day, gap DESC
+                   ROWS UNBOUNDED PRECEDING
+               ) AS island
+        FROM days
+    ),
+    islands AS (
+        SELECT patient_id, routine_id, island, COUNT(*) AS streak, MAX(day) AS last_day
+        FROM numbered
+        GROUP BY patient_id, routine_id, island
+    )
+    INSERT INTO exercise_stats (patient_id, routine_id, total_sessions, current_streak, longest_streak, last_session_date)
+    SELECT patient_id, routine_id, SUM(streak),
+           MAX(CASE WHEN island = last_island THEN streak END), MAX(streak), MAX(last_day)
+    FROM (
+        SELECT *, MAX(island) OVER (PARTITION BY patient_id, routine_id) AS last_island
+        FROM islands
+    )
+    GROUP BY patient_id, routine_id
+    """
+
+# Incremental update for a session logged on or after the last session date.
+# SET expressions all see the row's previous values.
+EXERCISE_STATS_UPSERT_SQL = """
+    INSERT INTO exercise_stats (patient_id, routine_id, total_sessions, current_streak, longest_streak, last_session_date)
+    VALUES (?, ?, 1, 1, 1, date(?))
+    ON CONFLICT (patient_id, routine_id) DO UPDATE SET
+        total_sessions = total_sessions + 1,
+        current_streak = CASE
+            WHEN julianday(excluded.last_session_date) - julianday(last_session_date) = 1 THEN current_streak + 1
+            ELSE 1
+        END,
+        longest_streak = MAX(longest_streak, CASE
+            WHEN julianday(excluded.last_session_date) - julianday(last_session_date) = 1 THEN current_streak + 1
+            ELSE 1
+        END),
+        last_session_date = excluded.last_session_date
+    """
+
+ROUTINE_EXERCISES_QUERY = """
+    SELECT e.name, e.description, e.phase, e.video
+    FROM exercises e
+    JOIN routine_exercises re ON e.id = re.exercise_id
+    WHERE re.routine_id = ?
+    ORDER BY e.phase
+    """
+
+# Every routine with its exercises, one row per exercise (or one empty row)
+ROUTINE_CATALOG_QUERY = """
+    SELECT r.id, r.name, r.description, r.music,
+           e.name AS exercise_name, e.description AS exercise_description, e.phase, e.video
+    FROM routines r
+    LEFT JOIN routine_exercises re ON re.routine_id = r.id
+    LEFT JOIN exercises e ON e.id = re.exercise_id
+    ORDER BY r.id
+    """
+
+# Order exercises are shown in within a routine; other phases come last
+PHASE_ORDER = ["Warm-Up", "Movements", "Cool-Down and Closing"]
 
 @st.cache_resource
 def load_exercise_data():
     return json.loads(os.getenv("EXERCISES"))
 
-def get_connection():
-    conn = sqlite3.connect('kupuna.db')
+def open_connection(path=DB_PATH):
+    """
+    Open a new SQLite connection with WAL journaling and tuned pragmas.
+    Connections are in autocommit mode; use transaction() to group writes.
+    """
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None, check_same_thread=False)
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
     return conn
 
-@st.cache_resource
-def initialize_database():
+class ConnectionPool:
     """
-    Initialize the SQLite database and create the table if it doesn't exist.
-    Ensures initialization runs only once per session.
+    Process-wide pool of connections to one SQLite file. Connections are
+    borrowed for the duration of a block and opened only when none is idle;
+    nested calls on the same thread get the same connection.
     """
-    if "db_initialized" not in st.session_state:
-        # Load database URL from TOML config
-        conn = get_connection()
-        cursor = conn.cursor()
-
-        schema = os.getenv("SCHEMA_SQL")
-        cursor.executescript(schema)
-        
-        exercise_data = load_exercise_data()
-        # Insert data into the database
-        for mobility, lengths in exercise_data.items():
-            for length, phases in lengths.items():
-                for phase, exercises in phases.items():
-                    for exercise in exercises:
-                        cursor.execute('''
-                            INSERT INTO exercises (mobility, length, phase, name, description, video)
-                            VALUES (?, ?, ?, ?, ?, ?)
-                        ''', (mobility, length, phase, exercise['name'], exercise['description'], exercise['video']))
-
-        # Insert test users
-        users = os.getenv("USERS")
-        csv_reader = csv.DictReader(StringIO(users))
-        for row in csv_reader:
+    def __init__(self, path=DB_PATH, size=DB_POOL_SIZE):
+        self.path = path
+        self.size = size
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        # The connection the current thread has borrowed
+        self._local = threading.local()
+
+    def _checkout(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                # A forked worker process never reuses the connections of its parent
+                self._idle = queue.LifoQueue(maxsize=self.size)
+                self._pid = os.getpid()
+            idle = self._idle
+        try:
+            return idle.get_nowait()
+        except queue.Empty:
+            return open_connection(self.path)
+
+    def _checkin(self, conn):
+        if self._pid == os.getpid() and not conn.in_transaction:
             try:
-                cursor.execute('''
-                    INSERT INTO users (username, password, role)
-                    VALUES (?, ?, ?)
-                ''', (row['username'], bcrypt.hashpw(row['password'].encode(), bcrypt.gensalt()), row['role']))
-            except:
-                continue
-          
-        conn.commit()
+                self._idle.put_nowait(conn)
+                return
+            except queue.Full:
+                pass
         conn.close()
-        st.session_state["db_initialized"] = True  # Mark initialization as complete
 
-@st.cache_data
-def get_all_exercises():
-    # Connect to the SQLite database
-    conn = get_connection()
-    cursor = conn.cursor()
+    @contextmanager
+    def connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            yield conn
+            return
+
+        conn = self._local.conn = self._checkout()
+        try:
+            yield conn
+        finally:
+            self._local.conn = None
+            self._checkin(conn)
+
+    @contextmanager
+    def transaction(self):
+        """
+        Run a block of statements in one write transaction on a pooled
+        connection. Nested calls join the outer transaction.
+        """
+        with self.connection() as conn:
+            if conn.in_transaction:
+                yield conn
+                return
+
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def close(self):
+        # Close the idle connections of this process
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            if self._pid == os.getpid():
+                conn.close()
+
+_pool = ConnectionPool()
 
-    # Query to fetch all data
-    cursor.execute('''
-        SELECT id, mobility, length, phase, name, description, video
+def connection():
+    """
+    Borrow a connection to DB_PATH from the process-wide pool for the
+    duration of the block.
+    """
+    return _pool.connection()
+
+def transaction():
+    return _pool.transaction()
+
+def close_pool():
+    _pool.close()
+
+def _split_statements(script):
+    # Split a SQL script into complete statements (handles triggers and quoted semicolons)
+    statements = []
+    buffer = ""
+    for line in script.splitlines(keepends=True):
+        buffer += line
+        if sqlite3.complete_statement(buffer):
+            statements.append(buffer.strip())
+            buffer = ""
+    if buffer.strip():
+        statements.append(buffer.strip())
+    return statements
+
+def _migrate_base_schema(conn):
+    # Tables come from the deployment's SCHEMA_SQL, which uses CREATE ... IF NOT EXISTS
+    for statement in _split_statements(os.getenv("SCHEMA_SQL")):
+        conn.execute(statement)
+
+def _migrate_hot_path_indexes(conn):
+    # Covering index for the log history and streak queries
+    conn.execute('''
+    CREATE INDEX IF NOT EXISTS idx_exercise_logs_patient_routine_date
+    ON exercise_logs (patient_id, routine_id, date_time, duration_minutes, mood_level)
+    ''')
+    conn.execute('''
+    CREATE INDEX IF NOT EXISTS idx_patient_routines_patient_routine
+    ON patient_routines (patient_id, routine_id)
+    ''')
+    conn.execute('''
+    CREATE INDEX IF NOT EXISTS idx_routine_exercises_routine_exercise
+    ON routine_exercises (routine_id, exercise_id)
+    ''')
+
+def _migrate_exercise_stats(conn):
+    # Materialized per patient/routine session statistics
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS exercise_stats (
+        patient_id INTEGER NOT NULL,
+        routine_id INTEGER NOT NULL,
+        total_sessions INTEGER NOT NULL,
+        current_streak INTEGER NOT NULL,
+        longest_streak INTEGER NOT NULL,
+        last_session_date TEXT NOT NULL,
+        PRIMARY KEY (patient_id, routine_id)
+    )
+    ''')
+    conn.execute("DELETE FROM exercise_stats")
+    conn.execute(EXERCISE_STATS_REBUILD_SQL.format(where=""))
+
+def _migrate_seed_keys(conn):
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS app_metadata (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    )
+    ''')
+
+    # Earlier startups inserted the seed exercises again on every run.
+    # Point routines at the first copy of each exercise and drop the rest.
+    conn.execute('''
+    CREATE TEMP TABLE exercise_duplicates AS
+    SELECT id, keep_id
+    FROM (
+        SELECT id, MIN(id) OVER (PARTITION BY mobility, length, phase, name) AS keep_id
         FROM exercises
+    )
+    WHERE id != keep_id
+    ''')
+    conn.execute('''
+    UPDATE routine_exercises
+    SET exercise_id = (SELECT keep_id FROM exercise_duplicates WHERE id = routine_exercises.exercise_id)
+    WHERE exercise_id IN (SELECT id FROM exercise_duplicates)
+    ''')
+    conn.execute("DELETE FROM exercises WHERE id IN (SELECT id FROM exercise_duplicates)")
+    conn.execute("DROP TABLE exercise_duplicates")
+
+    # Natural key used by the seeding upsert
+    conn.execute('''
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_exercises_natural_key
+    ON exercises (mobility, length, phase, name)
     ''')
 
-    # Fetch all results from the query
-    rows = cursor.fetchall()
+def _migrate_table_generations(conn):
+    # Write counters that key the st.cache_data read helpers
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS table_generations (
+        table_name TEXT PRIMARY KEY,
+        generation INTEGER NOT NULL
+    )
+    ''')
+
+def _migrate_patient_person_key(conn):
+    # Lokahi PRIMARY_PERSON_KEY, so re-imported members update instead of duplicating
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(patients)")}
+    if "person_key" not in columns:
+        conn.execute("ALTER TABLE patients ADD COLUMN person_key TEXT")
+    conn.execute('''
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_patients_person_key
+    ON patients (person_key)
+    ''')
+
+def _migrate_video_metadata(conn):
+    # Thumbnail, title and duration shown before a video embed is loaded
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS video_metadata (
+        video_id TEXT PRIMARY KEY,
+        title TEXT,
+        duration_seconds INTEGER,
+        thumbnail_url TEXT,
+        fetched_at TEXT
+    )
+    ''')
+
+# Numbered schema upgrades, applied in order. Each one must be idempotent.
+MIGRATIONS = (
+    (1, "base schema", _migrate_base_schema),
+    (2, "hot-path indexes", _migrate_hot_path_indexes),
+    (3, "exercise stats", _migrate_exercise_stats),
+    (4, "seed keys", _migrate_seed_keys),
+    (5, "table generations", _migrate_table_generations),
+    (6, "patient person key", _migrate_patient_person_key),
+    (7, "video metadata", _migrate_video_metadata),
+)
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+def bump_generations(conn, *tables):
+    """
+    Advance the write generation of each table. Call inside the write
+    transaction so readers never see new rows under an old generation.
+    """
+    conn.executemany('''
+    INSERT INTO table_generations (table_name, generation) VALUES (?, 1)
+    ON CONFLICT (table_name) DO UPDATE SET generation = generation + 1
+    ''', [(table,) for table in tables])
+
+def get_generations(*tables):
+    """
+    Return the current write generations of the given tables, in order.
+    Cached read helpers take this tuple as their first argument, so a write
+    from any worker process invalidates them on the next read.
+    """
+    placeholders = ", ".join("?" for _ in tables)
+    with connection() as conn:
+        rows = conn.execute(
+            f"SELECT table_name, generation FROM table_generations WHERE table_name IN ({placeholders})", tables
+        ).fetchall()
+    generations = dict(rows)
+    return tuple(generations.get(table, 0) for table in tables)
+
+def get_schema_version(conn=None):
+    with connection() as pooled:
+        return (conn or pooled).execute("PRAGMA user_version").fetchone()[0]
+
+def migrate():
+    """
+    Bring the database up to SCHEMA_VERSION.
+    Each migration runs in its own write transaction together with the
+    PRAGMA user_version bump, so concurrent workers apply it exactly once.
+    """
+    applied = []
+    with connection() as conn:
+        for version, description, upgrade in MIGRATIONS:
+            if get_schema_version(conn) >= version:
+                continue
+            with transaction() as conn:
+                # Another process may have applied it while we waited for the lock
+                if get_schema_version(conn) >= version:
+                    continue
+                upgrade(conn)
+                conn.execute(f"PRAGMA user_version = {version}")
+            applied.append(description)
+    return applied
+
+def _exercise_seed_rows(exercise_data):
+    # Flatten the nested EXERCISES mapping into exercises table rows
+    for mobility, lengths in exercise_data.items():
+        for length, phases in lengths.items():
+            for phase, exercises in phases.items():
+                for exercise in exercises:
+                    yield (mobility, length, phase, exercise['name'], exercise['description'], exercise['video'])
+
+def get_metadata(key, conn=None):
+    with connection() as pooled:
+        row = (conn or pooled).execute("SELECT value FROM app_metadata WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else None
+
+def set_metadata(key, value, conn=None):
+    with connection() as pooled:
+        (conn or pooled).execute('''
+        INSERT INTO app_metadata (key, value) VALUES (?, ?)
+        ON CONFLICT (key) DO UPDATE SET value = excluded.value
+        ''', (key, value))
+
+def seed_database():
+    """
+    Load the EXERCISES and USERS seed data.
+    Skips all work when the content hash of the seed data matches the one stored
+    by the last run, so only the first worker after a seed change pays for it.
+    Returns True when the seed data was (re)applied.
+    """
+    exercises_json = os.getenv("EXERCISES")
+    users_csv = os.getenv("USERS")
+    seed_hash = hashlib.sha256(f"{exercises_json}\0{users_csv}".encode()).hexdigest()
+
+    if get_metadata("seed_hash") == seed_hash:
+        return False
+
+    exercise_rows = list(_exercise_seed_rows(load_exercise_data()))
+
+    # Hash passwords only for users that do not exist yet, outside the write lock
+    from auth import hash_passwords
+
+    with connection() as conn:
+        existing_users = {row[0] for row in conn.execute("SELECT username FROM users")}
+    new_users = [row for row in csv.DictReader(StringIO(users_csv)) if row['username'] not in existing_users]
+    password_hashes = hash_passwords([row['password'] for row in new_users]) if new_users else []
+    user_rows = [
+        (row['username'], password_hash, row['role'])
+        for row, password_hash in zip(new_users, password_hashes)
+    ]
+
+    with transaction() as conn:
+        # Another worker may have seeded while we were hashing
+        if get_metadata("seed_hash", conn) == seed_hash:
+            return False
+
+        conn.executemany('''
+        INSERT INTO exercises (mobility, length, phase, name, description, video)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (mobility, length, phase, name) DO UPDATE SET
+            description = excluded.description,
+            video = excluded.video
+        WHERE description IS NOT excluded.description OR video IS NOT excluded.video
+        ''', exercise_rows)
+
+        conn.executemany('''
+        INSERT OR IGNORE INTO users (username, password, role)
+        VALUES (?, ?, ?)
+        ''', user_rows)
+
+        set_metadata("seed_hash", seed_hash, conn)
+        bump_generations(conn, "exercises", "users")
+    return True
+
+@st.cache_resource
+def initialize_database():
+    """
+    Initialize the SQLite database: apply schema migrations and load seed data.
+    Both steps are idempotent and cheap when nothing changed, so every worker
+    process can run them on startup.
+    """
+    migrate()
+    seed_database()
+
+def get_all_exercises():
+    return _get_all_exercises(get_generations("exercises"))
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES)
+def _get_all_exercises(generations):
+    with connection() as conn:
+        cursor = conn.cursor()
+
+        # Query to fetch all data
+        cursor.execute('''
+            SELECT id, mobility, length, phase, name, description, video
+            FROM exercises
+        ''')
+
+        # Fetch all results from the query
+        rows = cursor.fetchall()
 
     # Create a nested dictionary structure
     exercise_data = defaultdict(lambda: defaultdict(lambda: defaultdict(list)))
@@ -90,195 +523,320 @@ def get_all_exercises():
     # Convert defaultdict to a standard dictionary
     exercise_data = {k: {kk: dict(vv) for kk, vv in v.items()} for k, v in exercise_data.items()}
 
-    # Close the database connection
-    conn.close()
-
     # Return the exercises dictionary
     return exercise_data
 
 def insert_routine(routine_name, description, music, exercise_ids):
-    # Connect to SQLite database
-    conn = get_connection()
-    cursor = conn.cursor()
+    with transaction() as conn:
+        cursor = conn.cursor()
 
-    # Insert routine into the 'routines' table
-    cursor.execute('''
-    INSERT INTO routines (name, description, music)
-    VALUES (?, ?, ?)
-    ''', (routine_name, description, music))
+        # Insert routine into the 'routines' table
+        cursor.execute('''
+        INSERT INTO routines (name, description, music)
+        VALUES (?, ?, ?)
+        ''', (routine_name, description, music))
 
-    # Get the ID of the newly inserted routine
-    routine_id = cursor.lastrowid
+        # Get the ID of the newly inserted routine
+        routine_id = cursor.lastrowid
 
-    # Insert each exercise into the 'routine_exercises' table
-    for exercise_id in exercise_ids:
-        cursor.execute('''
+        # Insert each exercise into the 'routine_exercises' table
+        cursor.executemany('''
         INSERT INTO routine_exercises (routine_id, exercise_id)
         VALUES (?, ?)
-        ''', (routine_id, exercise_id))
+        ''', [(routine_id, exercise_id) for exercise_id in exercise_ids])
 
-    # Commit the transaction and close the connection
-    conn.commit()
-    conn.close()
+        bump_generations(conn, "routines", "routine_exercises")
 
 def assign_patient_to_routine(patient_id, routine_id):
-    # Connect to the SQLite database
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    # Insert the patient-routine relationship into the patient_routines table
-    cursor.execute('''
-    INSERT OR REPLACE INTO patient_routines (patient_id, routine_id)
-    VALUES (?, ?)
-    ''', (patient_id, routine_id))
+    with transaction() as conn:
+        # Insert the patient-routine relationship into the patient_routines table
+        conn.execute('''
+        INSERT OR REPLACE INTO patient_routines (patient_id, routine_id)
+        VALUES (?, ?)
+        ''', (patient_id, routine_id))
 
-    # Commit the changes and close the connection
-    conn.commit()
-    conn.close()
+        bump_generations(conn, "patient_routines")
 
 def insert_exercise_log(patient_id, routine_id, date_time, duration_minutes, mood_level, comments=None):
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    cursor.execute('''
-    INSERT INTO exercise_logs (patient_id, routine_id, date_time, duration_minutes, mood_level, comments)
-    VALUES (?, ?, ?, ?, ?, ?)
-    ''', (patient_id, routine_id, date_time, duration_minutes, mood_level, comments))
+    with transaction() as conn:
+        conn.execute('''
+        INSERT INTO exercise_logs (patient_id, routine_id, date_time, duration_minutes, mood_level, comments)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ''', (patient_id, routine_id, date_time, duration_minutes, mood_level, comments))
+
+        # Keep exercise_stats current in the same transaction
+        backfilled = conn.execute('''
+        SELECT date(?) < last_session_date
+        FROM exercise_stats
+        WHERE patient_id = ? AND routine_id = ?
+        ''', (date_time, patient_id, routine_id)).fetchone()
+        if backfilled and backfilled[0]:
+            # A session older than the latest one changes earlier streaks
+            rebuild_exercise_stats(patient_id, routine_id)
+        else:
+            conn.execute(EXERCISE_STATS_UPSERT_SQL, (patient_id, routine_id, date_time))
 
-    conn.commit()
-    conn.close()
+        bump_generations(conn, "exercise_logs", "exercise_stats")
 
 def fetch_patients():
-    conn = get_connection()
+    return _fetch_patients(get_generations("patients"))
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES)
+def _fetch_patients(generations):
     query = """
     SELECT id, name, age, gender, race
     FROM patients
     """
-    patients = pd.read_sql(query, conn)
-    conn.close()
-    return patients
+    with connection() as conn:
+        return pd.read_sql(query, conn)
 
 def fetch_routines():
-    conn = get_connection()
+    return _fetch_routines(get_generations("routines"))
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES)
+def _fetch_routines(generations):
     query = """
     SELECT id, name, description, music
     FROM routines
     """
-    routines = pd.read_sql(query, conn)
-    conn.close()
-    return routines
+    with connection() as conn:
+        return pd.read_sql(query, conn)
 
 def fetch_patient_routines():
-    conn = get_connection()
-    query = """
-    SELECT pr.patient_id, pr.routine_id, p.name AS patient_name, r.name AS routine_name
-    FROM patient_routines pr
-    JOIN patients p ON pr.patient_id = p.id
-    JOIN routines r ON pr.routine_id = r.id
-    """
-    patient_routines = pd.read_sql(query, conn)
-    conn.close()
-    return patient_routines
+    return _fetch_patient_routines(get_generations("patient_routines", "patients", "routines"))
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES)
+def _fetch_patient_routines(generations):
+    with connection() as conn:
+        return pd.read_sql(PATIENT_ROUTINES_QUERY, conn)
 
 def fetch_exercise_logs(patient_id, routine_id):
-    conn = get_connection()
-    query = """
-    SELECT date_time, duration_minutes, mood_level
-    FROM exercise_logs
-    WHERE patient_id = ? AND routine_id = ?
-    ORDER BY date_time
-    """
-    exercise_logs = pd.read_sql(query, conn, params=(patient_id, routine_id))
-    conn.close()
-    return exercise_logs
+    return _fetch_exercise_logs(get_generations("exercise_logs"), patient_id, routine_id)
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES)
+def _fetch_exercise_logs(generations, patient_id, routine_id):
+    with connection() as conn:
+        return pd.read_sql(EXERCISE_LOGS_QUERY, conn, params=(patient_id, routine_id))
 
-@st.cache_data
 def get_exercises_for_routine(routine_id):
-    conn = get_connection()
-    query = """
-        SELECT e.name, e.description, e.phase, e.video
-        FROM exercises e
-        JOIN routine_exercises re ON e.id = re.exercise_id
-        WHERE re.routine_id = ?
-        ORDER BY e.phase
-    """
-    exercises = pd.read_sql(query, conn, params=(routine_id,))
-    conn.close()
-    return exercises
-    
-def add_user(username, password, role):
-    password = bcrypt.hashpw(password.encode(), bcrypt.gensalt())
-    conn = get_connection()
-  
-    cursor = conn.cursor()
-    cursor.execute("INSERT INTO users (username, password, role) VALUES (?, ?, ?)", (username, password, role))
-    
-    conn.commit()
-    conn.close()
-
-@st.cache_data
+    return _get_exercises_for_routine(get_generations("exercises", "routine_exercises"), routine_id)
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES)
+def _get_exercises_for_routine(generations, routine_id):
+    with connection() as conn:
+        return pd.read_sql(ROUTINE_EXERCISES_QUERY, conn, params=(routine_id,))
+
+class RoutineCatalog:
+    """
+    All routines with their exercises, indexed by routine id. Each routine
+    is a dict with id, name, description, music and exercises, a list of
+    exercise dicts already in PHASE_ORDER.
+    """
+    def __init__(self, rows):
+        phase_rank = {phase: rank for rank, phase in enumerate(PHASE_ORDER)}
+        self.routines = {}
+        for routine_id, name, description, music, exercise_name, exercise_description, phase, video in rows:
+            routine = self.routines.get(routine_id)
+            if routine is None:
+                routine = self.routines[routine_id] = {
+                    "id": routine_id, "name": name, "description": description, "music": music, "exercises": [],
+                }
+            if exercise_name is not None:
+                routine["exercises"].append(
+                    {"name": exercise_name, "description": exercise_description, "phase": phase, "video": video}
+                )
+        for routine in self.routines.values():
+            # Stable, so exercises keep their stored order within a phase
+            routine["exercises"].sort(key=lambda exercise: phase_rank.get(exercise["phase"], len(PHASE_ORDER)))
+        self.ids = list(self.routines)
+
+    def __len__(self):
+        return len(self.routines)
+
+    def __getitem__(self, routine_id):
+        return self.routines[routine_id]
+
+    def name(self, routine_id):
+        return self.routines[routine_id]["name"]
+
+def get_routine_catalog():
+    """
+    The RoutineCatalog, loaded with one query and shared by all sessions
+    until routines, their exercises or the exercises change.
+    """
+    return _get_routine_catalog(get_generations("routines", "routine_exercises", "exercises"))
+
+# A resource rather than data: cache_data would copy the whole catalog on every read
+@st.cache_resource(max_entries=2)
+def _get_routine_catalog(generations):
+    with connection() as conn:
+        return RoutineCatalog(conn.execute(ROUTINE_CATALOG_QUERY))
+
+def get_video_metadata(video_ids):
+    """
+    Return {video_id: row dict} for the given YouTube IDs that have
+    stored metadata.
+    """
+    return _get_video_metadata(get_generations("video_metadata"), tuple(sorted(set(video_ids))))
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES)
+def _get_video_metadata(generations, video_ids):
+    metadata = {}
+    # Stay well under SQLite's bound parameter limit
+    for start in range(0, len(video_ids), 500):
+        batch = video_ids[start:start + 500]
+        placeholders = ", ".join("?" for _ in batch)
+        with connection() as conn:
+            rows = conn.execute(f'''
+            SELECT video_id, title, duration_seconds, thumbnail_url
+            FROM video_metadata
+            WHERE video_id IN ({placeholders})
+            ''', batch).fetchall()
+        for video_id, title, duration_seconds, thumbnail_url in rows:
+            metadata[video_id] = {"title": title, "duration_seconds": duration_seconds, "thumbnail_url": thumbnail_url}
+    return metadata
+
+def upsert_video_metadata(rows):
+    # rows are (video_id, title, duration_seconds, thumbnail_url) tuples
+    with transaction() as conn:
+        conn.executemany('''
+        INSERT INTO video_metadata (video_id, title, duration_seconds, thumbnail_url, fetched_at)
+        VALUES (?, ?, ?, ?, datetime('now'))
+        ON CONFLICT (video_id) DO UPDATE SET
+            title = excluded.title,
+            duration_seconds = excluded.duration_seconds,
+            thumbnail_url = excluded.thumbnail_url,
+            fetched_at = excluded.fetched_at
+        ''', rows)
+        bump_generations(conn, "video_metadata")
+
+def add_user(username, password_hash, role):
+    # Hashing happens in auth.py, off the script thread
+    with transaction() as conn:
+        conn.execute("INSERT INTO users (username, password, role) VALUES (?, ?, ?)", (username, password_hash, role))
+        bump_generations(conn, "users")
+
+def set_password(username, password_hash):
+    with transaction() as conn:
+        conn.execute("UPDATE users SET password = ? WHERE username = ?", (password_hash, username))
+        bump_generations(conn, "users")
+
 def get_user(username):
-    conn = get_connection()
-    query = "SELECT username, password, role FROM users WHERE username = ?"
-    df = pd.read_sql(query, conn, params=(username,))
-    user = df.iloc[0] if not df.empty else None
-    conn.close()
-    return user
-
-def bulk_insert_patient(df):
-    conn = get_connection()
-    
+    return _get_user(get_generations("users"), username)
+
+# Password hashes are only kept in memory for USER_CACHE_TTL seconds
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, ttl=USER_CACHE_TTL)
+def _get_user(generations, username):
+    query = "SELECT rowid AS id, username, password, role FROM users WHERE username = ?"
+    with connection() as conn:
+        df = pd.read_sql(query, conn, params=(username,))
+    return df.iloc[0] if not df.empty else None
+
+def upsert_patients(df):
+    """
+    Insert new members and update changed age or gender of existing ones,
+    matching on PRIMARY_PERSON_KEY. Existing names and races are kept.
+    The batch is staged in a temp table and merged in one transaction.
+    Returns a dict with inserted, updated and skipped counts.
+    """
     # Map the columns from the CSV to match the database schema
-    mapped_df = df[["NAME", "MEM_AGE", "MEM_GENDER", "MEM_RACE"]].rename(
+    mapped_df = df[["PRIMARY_PERSON_KEY", "NAME", "MEM_AGE", "MEM_GENDER", "MEM_RACE"]].rename(
         columns={
+            "PRIMARY_PERSON_KEY": "person_key",
             "NAME": "name",
             "MEM_AGE": "age",
             "MEM_GENDER": "gender",
             "MEM_RACE": "race"
         }
     )
+    rows = mapped_df.astype(object).where(mapped_df.notna(), None).itertuples(index=False, name=None)
+
+    with transaction() as conn:
+        conn.execute('''
+        CREATE TEMP TABLE IF NOT EXISTS patient_staging (
+            person_key TEXT PRIMARY KEY,
+            name TEXT,
+            age INTEGER,
+            gender TEXT,
+            race TEXT
+        )
+        ''')
+        conn.execute("DELETE FROM patient_staging")
+        # The last row wins when a batch repeats a person
+        conn.executemany("INSERT OR REPLACE INTO patient_staging VALUES (?, ?, ?, ?, ?)", rows)
+
+        staged = conn.execute("SELECT COUNT(*) FROM patient_staging").fetchone()[0]
+        inserted, updated = conn.execute('''
+        SELECT COUNT(*) - COUNT(p.person_key),
+               COUNT(CASE WHEN p.person_key IS NOT NULL
+                           AND (p.age IS NOT s.age OR p.gender IS NOT s.gender) THEN 1 END)
+        FROM patient_staging s
+        LEFT JOIN patients p ON p.person_key = s.person_key
+        ''').fetchone()
+
+        conn.execute('''
+        INSERT INTO patients (person_key, name, age, gender, race)
+        SELECT person_key, name, age, gender, race FROM patient_staging WHERE true
+        ON CONFLICT (person_key) DO UPDATE SET
+            age = excluded.age,
+            gender = excluded.gender
+        WHERE age IS NOT excluded.age OR gender IS NOT excluded.gender
+        ''')
+        conn.execute("DELETE FROM patient_staging")
+
+        if inserted or updated:
+            bump_generations(conn, "patients")
+
+    return {"inserted": inserted, "updated": updated, "skipped": staged - inserted - updated}
+
+def rebuild_exercise_stats(patient_id=None, routine_id=None):
+    """
+    Recompute exercise_stats from exercise_logs, for every patient and routine
+    or just for one pair.
+    """
+    with transaction() as conn:
+        if patient_id is None:
+            conn.execute("DELETE FROM exercise_stats")
+            conn.execute(EXERCISE_STATS_REBUILD_SQL.format(where=""))
+        else:
+            params = (patient_id, routine_id)
+            conn.execute("DELETE FROM exercise_stats WHERE patient_id = ? AND routine_id = ?", params)
+            conn.execute(EXERCISE_STATS_REBUILD_SQL.format(where="WHERE patient_id = ? AND routine_id = ?"), params)
 
-    # Insert DataFrame into the SQLite table
-    mapped_df.to_sql("patients", conn, if_exists="append", index=False)
-    
-    conn.commit()
-    conn.close()
+        bump_generations(conn, "exercise_stats")
 
 def get_exercise_stats(patient_id, routine_id):
-    # Connect to the database
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    # Query data
-    query = """
-    SELECT date_time 
-    FROM exercise_logs
-    WHERE patient_id = ? AND routine_id = ?
-    ORDER BY date_time
-    """
-    
-    cursor.execute(query, (patient_id, routine_id))
-    rows = cursor.fetchall()
-
-    if not rows:
-        conn.close()
+    return _get_exercise_stats(get_generations("exercise_stats"), patient_id, routine_id)
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES)
+def _get_exercise_stats(generations, patient_id, routine_id):
+    # One primary-key lookup, independent of the history length
+    with connection() as conn:
+        row = conn.execute(EXERCISE_STATS_QUERY, (patient_id, routine_id)).fetchone()
+    if row is None:
         return 0, 0
-    
-    # Calculate streaks in Python
-    dates = [datetime.strptime(row[0], "%Y-%m-%d").date() for row in rows]
-    streaks = []
-    current_streak = 1
-
-    for i in range(1, len(dates)):
-        if (dates[i] - dates[i - 1]).days == 1:
-            current_streak += 1
-        else:
-            streaks.append(current_streak)
-            current_streak = 1
-    streaks.append(current_streak)
 
-    total_sessions = len(dates)
-    longest_streak = max(streaks)
-
-    conn.close()
+    total_sessions, longest_streak = row
     return total_sessions, longest_streak
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Kūpuna Care database maintenance")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("migrate", help="apply pending schema migrations")
+    commands.add_parser("rebuild-stats", help="recompute exercise_stats from exercise_logs")
+    args = parser.parse_args()
+
+    if args.command == "migrate":
+        applied = migrate()
+        print(f"Schema version {get_schema_version()}; applied: {', '.join(applied) or 'none'}")
+    elif args.command == "rebuild-stats":
+        migrate()
+        rebuild_exercise_stats()
+        with connection() as conn:
+            count = conn.execute("SELECT COUNT(*) FROM exercise_stats").fetchone()[0]
+        print(f"Rebuilt exercise stats for {count} patient routines")
+
+if __name__ == "__main__":
+    main()
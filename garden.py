@@ -0,0 +1,392 @@
+import os
+import sys
+import time
+import random
+import logging
+import sqlite3
+import hashlib
+import tempfile
+import threading
+import urllib.parse
+
+from io import BytesIO
+from functools import lru_cache
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from database import DB_PATH, ConnectionPool, get_exercise_stats
+from outbound import Upstream, single_flight
+
+IMAGE_GEN_API = os.getenv('IMAGE_GEN_API')
+IMAGE_GEN_PROMPT = os.getenv('IMAGE_GEN_PROMPT')
+# "local" composes sprites on this server; "remote" asks IMAGE_GEN_API for a stylized garden
+GARDEN_MODE = os.getenv("GARDEN_MODE", "local").lower()
+# Composed sprite gardens kept in memory for incremental redraws. Each is a
+# full RGBA canvas of about 1.3 MB, so this caps their memory at about 10 MB.
+GARDEN_RENDER_CACHE = int(os.getenv("GARDEN_RENDER_CACHE", "8"))
+# Latency budget for one garden image; the socket timeouts sit inside it
+GARDEN_TIMEOUT = float(os.getenv("GARDEN_TIMEOUT", "15"))
+GARDEN_CONNECT_TIMEOUT = float(os.getenv("GARDEN_CONNECT_TIMEOUT", "3"))
+
+# Downloaded gardens, shared by every worker and kept across restarts
+GARDEN_CACHE_DIR = os.getenv(
+    "GARDEN_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(DB_PATH)), "garden_cache")
+)
+GARDEN_CACHE_MAX_BYTES = int(os.getenv("GARDEN_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+# Background warm-up of the garden after a logged session
+GARDEN_PRERENDER_WORKERS = int(os.getenv("GARDEN_PRERENDER_WORKERS", "2"))
+GARDEN_PRERENDER_MAX_PENDING = int(os.getenv("GARDEN_PRERENDER_MAX_PENDING", "64"))
+
+garden_upstream = Upstream("garden", GARDEN_TIMEOUT)
+logger = logging.getLogger(__name__)
+
+class ImageCache:
+    """
+    Content-addressed image files on disk, bounded to max_bytes with
+    least-recently-used eviction. A SQLite index in the same directory
+    holds sizes, access times and hit counters, so several workers can
+    share the cache. Files are written to a temp name and renamed into
+    place, so readers never see a partial image.
+    """
+    def __init__(self, directory=GARDEN_CACHE_DIR, max_bytes=GARDEN_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        # Shared by every rerun thread, like the main database's connections
+        self._pool = ConnectionPool(os.path.join(directory, "index.db"))
+        with self._pool.connection() as conn:
+            conn.execute('''
+            CREATE TABLE IF NOT EXISTS images (
+                key TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            ''')
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_images_accessed ON images (accessed_at)")
+            conn.execute('''
+            CREATE TABLE IF NOT EXISTS counters (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            )
+            ''')
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def _count(self, conn, **increments):
+        conn.executemany('''
+        INSERT INTO counters (name, value) VALUES (?, ?)
+        ON CONFLICT (name) DO UPDATE SET value = value + excluded.value
+        ''', increments.items())
+
+    def get(self, key, count=True):
+        try:
+            with open(self.path(key), "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            if count:
+                with self._pool.connection() as conn:
+                    self._count(conn, misses=1)
+            return None
+
+        with self._pool.connection() as conn:
+            # Upsert, so a file whose index row was lost is still tracked for eviction
+            conn.execute('''
+            INSERT INTO images (key, size, accessed_at) VALUES (?, ?, ?)
+            ON CONFLICT (key) DO UPDATE SET accessed_at = excluded.accessed_at
+            ''', (key, len(data), time.time()))
+            if count:
+                self._count(conn, hits=1, bytes_saved=len(data))
+        return data
+
+    def put(self, key, data):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+        with self._pool.transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO images (key, size, accessed_at) VALUES (?, ?, ?)",
+                (key, len(data), time.time())
+            )
+            # Oldest entries beyond the byte budget; the newest image always stays
+            evicted = [row[0] for row in conn.execute('''
+            SELECT key FROM (
+                SELECT key, SUM(size) OVER (ORDER BY accessed_at DESC, key) AS running_bytes
+                FROM images
+            )
+            WHERE running_bytes > ? AND key != ?
+            ''', (self.max_bytes, key))]
+            conn.executemany("DELETE FROM images WHERE key = ?", [(evicted_key,) for evicted_key in evicted])
+
+        for evicted_key in evicted:
+            try:
+                os.unlink(self.path(evicted_key))
+            except FileNotFoundError:
+                pass
+
+    def stats(self):
+        with self._pool.connection() as conn:
+            counters = dict(conn.execute("SELECT name, value FROM counters"))
+            entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM images").fetchone()
+        hits, misses = counters.get("hits", 0), counters.get("misses", 0)
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": hits / (hits + misses) if hits + misses else 0.0,
+            "bytes_saved": counters.get("bytes_saved", 0),
+            "entries": entries,
+            "bytes": size,
+        }
+
+garden_cache = ImageCache()
+
+def garden_prompt(total_sessions, longest_streak):
+    return IMAGE_GEN_PROMPT.format(total_sessions=total_sessions, longest_streak=longest_streak)
+
+def garden_url(total_sessions, longest_streak):
+    formatted_prompt = urllib.parse.quote(garden_prompt(total_sessions, longest_streak))
+    return f"{IMAGE_GEN_API}{formatted_prompt}"
+
+def garden_key(total_sessions, longest_streak):
+    # The same prompt against the same API gives an equivalent garden
+    return hashlib.sha256(f"{IMAGE_GEN_API}\0{garden_prompt(total_sessions, longest_streak)}".encode()).hexdigest()
+
+def download_image(url):
+    import requests
+    from PIL import Image
+
+    response = requests.get(url, timeout=(GARDEN_CONNECT_TIMEOUT, GARDEN_TIMEOUT))
+    response.raise_for_status()  # Ensure the request was successful
+    # Refuse to cache anything that is not an image, such as an error page
+    Image.open(BytesIO(response.content)).verify()
+    return response.content
+
+def _download_garden(key, url):
+    # A caller that just missed the previous flight finds the file cached
+    data = garden_cache.get(key, count=False)
+    if data is None:
+        data = garden_upstream.call(download_image, url)
+        try:
+            garden_cache.put(key, data)
+        except (sqlite3.Error, OSError) as e:
+            # The waiters still get the image; the next view downloads it again
+            logger.warning("Could not cache garden %s: %s", key, e)
+    return data
+
+def fetch_garden(total_sessions, longest_streak):
+    """
+    Return the encoded garden image from the disk cache, or download and
+    cache it. Sessions asking for the same garden at once share one download.
+    """
+    key = garden_key(total_sessions, longest_streak)
+    data = garden_cache.get(key)
+    if data is not None:
+        return data
+    return single_flight.do(("garden", key), _download_garden, key, garden_url(total_sessions, longest_streak))
+
+_prerender_pool = ThreadPoolExecutor(max_workers=GARDEN_PRERENDER_WORKERS, thread_name_prefix="garden-prerender")
+_prerender_jobs = {}
+_prerender_lock = threading.Lock()
+
+def _prerender(key, total_sessions, longest_streak):
+    try:
+        fetch_garden(total_sessions, longest_streak)
+    finally:
+        with _prerender_lock:
+            _prerender_jobs.pop(key, None)
+
+def prerender_garden(patient_id, routine_id):
+    """
+    Queue the garden for the pair's current stats so the next Virtual Garden
+    visit finds it cached. Gardens that are cached or already queued are
+    skipped, and new jobs are dropped while the queue is full. Returns the
+    job's future, or None when nothing was queued.
+    """
+    if GARDEN_MODE != "remote":
+        # Sprite gardens render in milliseconds on the page itself
+        return None
+
+    total_sessions, longest_streak = get_exercise_stats(patient_id, routine_id)
+    key = garden_key(total_sessions, longest_streak)
+    if os.path.exists(garden_cache.path(key)):
+        return None
+
+    with _prerender_lock:
+        if key in _prerender_jobs:
+            return _prerender_jobs[key]
+        if len(_prerender_jobs) >= GARDEN_PRERENDER_MAX_PENDING:
+            return None
+        future = _prerender_pool.submit(_prerender, key, total_sessions, longest_streak)
+        _prerender_jobs[key] = future
+        return future
+
+# Sprite garden canvas; flowers and trees beyond the caps are not drawn
+GARDEN_SIZE = (768, 432)
+GARDEN_HORIZON = 250
+MAX_FLOWERS = 200
+MAX_TREES = 30
+IMAGES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "images")
+FLOWER_COLORS = [(235, 90, 120), (250, 200, 60), (200, 120, 230), (255, 255, 255), (255, 140, 60)]
+
+_scenes = OrderedDict()
+_scenes_lock = threading.Lock()
+
+@lru_cache(maxsize=None)
+def _background():
+    from PIL import Image, ImageDraw
+
+    # Centre crop of the header photo, with a meadow over the lower part
+    photo = Image.open(os.path.join(IMAGES_DIR, "background.jpg")).convert("RGBA")
+    width, height = GARDEN_SIZE
+    crop_width = photo.height * width // height
+    left = (photo.width - crop_width) // 2
+    image = photo.crop((left, 0, left + crop_width, photo.height)).resize(GARDEN_SIZE)
+
+    meadow = Image.new("RGBA", GARDEN_SIZE, (0, 0, 0, 0))
+    draw = ImageDraw.Draw(meadow)
+    for y in range(GARDEN_HORIZON - 20, height):
+        alpha = min(255, (y - GARDEN_HORIZON + 20) * 12)
+        draw.line([0, y, width, y], fill=(96, 160, 72, alpha))
+    image.alpha_composite(meadow)
+    return image
+
+@lru_cache(maxsize=None)
+def flower_sprite(variant):
+    from PIL import Image, ImageDraw
+
+    # images/flower<variant>.png replaces the drawn sprite when present
+    path = os.path.join(IMAGES_DIR, f"flower{variant}.png")
+    if os.path.exists(path):
+        return Image.open(path).convert("RGBA")
+
+    sprite = Image.new("RGBA", (24, 32), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(sprite)
+    draw.line([12, 14, 12, 31], fill=(50, 110, 40), width=2)
+    draw.ellipse([12, 20, 20, 25], fill=(60, 130, 50))
+    color = FLOWER_COLORS[variant]
+    for dx, dy in ((0, -5), (5, -1), (3, 5), (-3, 5), (-5, -1)):
+        draw.ellipse([12 + dx - 4, 11 + dy - 4, 12 + dx + 4, 11 + dy + 4], fill=color)
+    draw.ellipse([9, 8, 15, 14], fill=(250, 220, 90))
+    return sprite
+
+@lru_cache(maxsize=None)
+def tree_sprite(variant):
+    from PIL import Image, ImageDraw
+
+    # images/tree<variant>.png replaces the drawn sprite when present
+    path = os.path.join(IMAGES_DIR, f"tree{variant}.png")
+    if os.path.exists(path):
+        return Image.open(path).convert("RGBA")
+
+    sprite = Image.new("RGBA", (64, 96), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(sprite)
+    if variant == 0:
+        # Round canopy tree
+        draw.rectangle([28, 50, 36, 95], fill=(110, 75, 40))
+        for box in ([6, 14, 42, 56], [22, 4, 58, 46], [14, 30, 54, 66]):
+            draw.ellipse(box, fill=(40, 120, 50))
+    else:
+        # Palm
+        draw.line([34, 95, 30, 60, 32, 24], fill=(130, 95, 55), width=6, joint="curve")
+        for end in ((4, 30), (14, 10), (50, 8), (62, 28), (8, 44), (58, 44)):
+            draw.line([32, 24, *end], fill=(50, 140, 60), width=5)
+    return sprite
+
+def _flower_spot(patient_id, index):
+    # Position and look of the patient's n-th flower; depends on nothing else
+    rng = random.Random(f"{patient_id}:flower:{index}")
+    width, height = GARDEN_SIZE
+    return rng.randrange(0, width - 24), rng.randrange(GARDEN_HORIZON + 8, height - 32), rng.randrange(len(FLOWER_COLORS))
+
+def _tree_spot(patient_id, index):
+    rng = random.Random(f"{patient_id}:tree:{index}")
+    return rng.randrange(0, GARDEN_SIZE[0] - 64), rng.randrange(GARDEN_HORIZON - 80, GARDEN_HORIZON - 30), rng.randrange(2)
+
+def _remember(key, image):
+    with _scenes_lock:
+        _scenes[key] = image
+        _scenes.move_to_end(key)
+        while len(_scenes) > GARDEN_RENDER_CACHE:
+            _scenes.popitem(last=False)
+
+def _nearest_scene(patient_id, trees, flowers):
+    # The memoized scene with the same trees and the most flowers up to the requested count
+    with _scenes_lock:
+        counts = [key[2] for key in _scenes if key[:2] == (patient_id, trees) and key[2] <= flowers]
+        if not counts:
+            return None, 0
+        key = (patient_id, trees, max(counts))
+        _scenes.move_to_end(key)
+        return _scenes[key], key[2]
+
+def render_garden(patient_id, total_sessions, longest_streak):
+    """
+    Compose the garden locally: one flower per session and one tree per
+    day of the longest streak, on the background photo. The layout is
+    seeded by patient ID, so a patient's garden only ever gains sprites.
+    Scenes are memoized, and a garden with more flowers than a memoized
+    one is that scene plus the new flowers blitted on top.
+    Returns a PIL image that callers must not modify.
+    """
+    patient_id = int(patient_id or 0)
+    trees = min(int(longest_streak), MAX_TREES)
+    flowers = min(int(total_sessions), MAX_FLOWERS)
+
+    scene, drawn = _nearest_scene(patient_id, trees, flowers)
+    if scene is not None and drawn == flowers:
+        return scene
+
+    if scene is None:
+        scene = _background().copy()
+        for index in range(trees):
+            x, y, variant = _tree_spot(patient_id, index)
+            scene.alpha_composite(tree_sprite(variant), (x, y))
+        drawn = 0
+    else:
+        scene = scene.copy()
+
+    for index in range(drawn, flowers):
+        x, y, variant = _flower_spot(patient_id, index)
+        scene.alpha_composite(flower_sprite(variant), (x, y))
+
+    _remember((patient_id, trees, flowers), scene)
+    return scene
+
+def garden_image(total_sessions, longest_streak, patient_id=None):
+    """
+    The garden for these stats. The local sprite garden by default; with
+    GARDEN_MODE=remote the stylized image from IMAGE_GEN_API as encoded
+    bytes, falling back to the sprite garden when the image service is
+    slow, failing or behind an open circuit. Either can be passed to st.image.
+    """
+    if GARDEN_MODE == "remote":
+        try:
+            return fetch_garden(total_sessions, longest_streak)
+        except Exception:
+            pass
+    return render_garden(patient_id, total_sessions, longest_streak)
+
+def main():
+    """
+    Print the garden image cache statistics:
+
+        python garden.py stats
+    """
+    if sys.argv[1:] != ["stats"]:
+        print(main.__doc__)
+        return
+    for name, value in garden_cache.stats().items():
+        print(f"{name}: {value:.1%}" if name == "hit_ratio" else f"{name}: {value}")
+
+if __name__ == "__main__":
+    main()
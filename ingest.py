@@ -0,0 +1,270 @@
+import pandas as pd
+import numpy as np
+import os
+import sqlite3
+import tempfile
+import time
+
+from database import upsert_patients
+
+# Rows read from each CSV per chunk, and members upserted per transaction
+CHUNK_SIZE = int(os.getenv("INGEST_CHUNK_SIZE", "50000"))
+BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "10000"))
+
+# Define race categories and ethnicity mapping
+race_categories = [
+    "Caucasian", "Black", "Native Hawaiian or Pacific Islander", "Portuguese",
+    "Filipino", "Japanese", "Chinese"
+]
+
+ethnicity_mapping = {
+    "Caucasian": 2,  # Not Hispanic
+    "Black": 3,
+    "Native Hawaiian or Pacific Islander": 3,  # Unknown
+    "Portuguese": 2,  # Not Hispanic
+    "Filipino": 1,  # Hispanic
+    "Japanese": 3,  # Unknown
+    "Chinese": 3    # Unknown
+}
+
+# Gender-specific names for each race
+race_to_name = {
+    "Caucasian": {
+        "M": [
+            "Alexander Baldwin", "Henry Perrine", "Ethan Taylor", 
+            "William Scott", "James Hunter"
+        ],
+        "F": [
+            "Emily Cooke", "Olivia Brown", "Sophia Harris", 
+            "Emma Thompson", "Charlotte Evans"
+        ]
+    },
+    "Native Hawaiian or Pacific Islander": {
+        "M": [
+            "Mike Malu", "Noah Kaipo", "Lani Kealoha", 
+            "Kimo Hekili", "Koa Malakai"
+        ],
+        "F": [
+            "Leilani Aloha", "Moana Kea", "Jennifer Lani", 
+            "Hina Kaleo", "Debbie Makana"
+        ]
+    },
+    "Portuguese": {
+        "M": [
+            "Antonio Silva", "Manuel Sousa", "Joao Mendes", 
+            "Carlos Almeida", "Francisco Moreira"
+        ],
+        "F": [
+            "Sofia Costa", "Isabel Ferreira", "Ana Oliveira", 
+            "Catarina Rocha", "Teresa Pires"
+        ]
+    },
+    "Filipino": {
+        "M": [
+            "Jose Rizal", "Andres Bonifacio", "Manuel Quezon", 
+            "Ramon Magsaysay", "Lapu-Lapu"
+        ],
+        "F": [
+            "Maria Clara", "Gabriela Silang", "Corazon Aquino", 
+            "Imelda Santos", "Jocelyn Cruz"
+        ]
+    },
+    "Japanese": {
+        "M": [
+            "Greg Tanaka", "Hiroshi Yamamoto", "Steve Suzuki", 
+            "Kenji Takeda", "Kevin Kobayashi"
+        ],
+        "F": [
+            "Mary Sato", "Akiko Nakamura", "Eunice Takahashi", 
+            "Hana Matsumoto", "Yuki Fujimoto"
+        ]
+    },
+    "Chinese": {
+        "M": [
+            "David Zhang", "Li Wei", "John Wang", 
+            "Kevin Chen", "Tony Huang"
+        ],
+        "F": [
+            "Lillian Mei", "Xiao Hong", "Julia Yi", 
+            "Angela Lin", "Grace Liu"
+        ]
+    },
+    "Black": {
+        "M": [
+            "James Brown", "Michael Johnson", "William Robinson", 
+            "David Carter", "Joseph Harris"
+        ],
+        "F": [
+            "Ava Jackson", "Emma Washington", "Sophia Jefferson", 
+            "Olivia Brooks", "Maya Scott"
+        ]
+    }
+}
+
+# Caucasian members whose ethnicity is not "Not Hispanic" (2) get Hispanic names
+hispanic_caucasian_names = {
+    "M": [
+        "Juan Garcia", "Carlos Diaz", "Miguel Torres", 
+        "Luis Ramirez", "Pedro Sanchez"
+    ],
+    "F": [
+        "Maria Gonzalez", "Isabella Martinez", "Ana Lopez", 
+        "Lucia Morales", "Elena Navarro"
+    ]
+}
+
+# Default name if gender or race is unknown
+default_name = "Taylor Morgan"
+
+genders = ["M", "F"]
+
+def _build_name_pools():
+    """
+    Flatten the name tables into arrays for vectorized lookup.
+    Pool index = (race index * 2 + hispanic flag) * 3 + gender index, where
+    gender index 2 is the single-name default pool.
+    """
+    pools = []
+    for race in race_categories:
+        for hispanic in (False, True):
+            names = hispanic_caucasian_names if hispanic and race == "Caucasian" else race_to_name[race]
+            pools.extend(names[gender] for gender in genders)
+            pools.append([default_name])
+
+    sizes = np.array([len(pool) for pool in pools])
+    offsets = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+    names = np.array([name for pool in pools for name in pool], dtype=object)
+    return names, offsets, sizes
+
+NAME_POOL, NAME_POOL_OFFSETS, NAME_POOL_SIZES = _build_name_pools()
+RACE_ARRAY = np.array(race_categories, dtype=object)
+ETHNICITY_ARRAY = np.array([ethnicity_mapping[race] for race in race_categories])
+
+def assign_demographics(df, rng=None):
+    """
+    Draw MEM_RACE, MEM_ETHNICITY and NAME for a whole batch at once.
+    Same distributions as the former row-wise apply: a uniform race,
+    its mapped ethnicity, and a uniform name from the race/gender pool.
+    Pass a seeded np.random.Generator for reproducible output.
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    count = len(df)
+
+    race_index = rng.integers(0, len(race_categories), count)
+    ethnicity = ETHNICITY_ARRAY[race_index]
+
+    gender = df["MEM_GENDER"].to_numpy(dtype=object)
+    gender_index = np.where(gender == "M", 0, np.where(gender == "F", 1, 2))
+    hispanic = (race_index == race_categories.index("Caucasian")) & (ethnicity != 2)
+    pool = (race_index * 2 + hispanic) * 3 + gender_index
+    pick = (rng.random(count) * NAME_POOL_SIZES[pool]).astype(np.int64)
+
+    df["MEM_RACE"] = RACE_ARRAY[race_index]
+    df["MEM_ETHNICITY"] = ethnicity
+    df["NAME"] = NAME_POOL[NAME_POOL_OFFSETS[pool] + pick]
+    return df
+
+def _clean_chunk(df):
+    # Strip whitespace from every column at once (all columns are read as text)
+    for col in df.columns:
+        df[col] = df[col].str.strip()
+    return df
+
+def _stage_csv(staging, table, source, columns, chunk_size):
+    # Copy the needed columns of a CSV into the staging database, one chunk at a time
+    placeholders = ", ".join("?" for _ in columns)
+    for chunk in pd.read_csv(source, chunksize=chunk_size, dtype=str):
+        chunk = _clean_chunk(chunk).reindex(columns=columns)
+        rows = chunk.astype(object).where(chunk.notna(), None).itertuples(index=False, name=None)
+        staging.executemany(f"INSERT INTO {table} VALUES ({placeholders})", rows)
+        staging.commit()
+
+def ingest_members(members_source, enrollment_source, chunk_size=CHUNK_SIZE, batch_size=BATCH_SIZE, progress=None, seed=None):
+    """
+    Stream Lokahi Members and Enrollment CSVs into the patients table.
+
+    Both files are read in chunks into a scratch SQLite database on disk and
+    joined there on PRIMARY_PERSON_KEY and MEM_MSA_NAME, so memory use does not
+    grow with the size of the extract. Each person is reduced to their latest
+    member month, given a synthetic name and race, and upserted with one
+    transaction per batch.
+
+    Sources may be paths or file-like objects. progress, if given, is called with
+    the number of members processed so far. seed makes the synthetic names
+    repeatable. Returns a report dict with rows, inserted, updated, skipped,
+    seconds and rows_per_second.
+    """
+    start = time.perf_counter()
+    counts = {"rows": 0, "inserted": 0, "updated": 0, "skipped": 0}
+    rng = np.random.default_rng(seed)
+
+    with tempfile.TemporaryDirectory(prefix="kupuna-ingest-") as workdir:
+        staging = sqlite3.connect(os.path.join(workdir, "staging.db"))
+        staging.execute("PRAGMA journal_mode=OFF")
+        staging.execute("PRAGMA synchronous=OFF")
+        staging.execute("CREATE TABLE members (person_key TEXT, msa TEXT, age INTEGER, yearmo TEXT)")
+        staging.execute("CREATE TABLE enrollment (person_key TEXT, msa TEXT, gender TEXT)")
+
+        _stage_csv(staging, "members", members_source, ["PRIMARY_PERSON_KEY", "MEM_MSA_NAME", "MEM_AGE", "YEARMO"], chunk_size)
+        _stage_csv(staging, "enrollment", enrollment_source, ["PRIMARY_PERSON_KEY", "MEM_MSA_NAME", "MEM_GENDER"], chunk_size)
+        staging.execute("CREATE INDEX idx_members_key ON members (person_key)")
+        staging.execute("CREATE INDEX idx_enrollment_key ON enrollment (person_key, msa)")
+
+        # Walk the join one batch of people at a time, in person key order.
+        # The bare age and gender columns come from the row holding the MAX():
+        # the latest member month, then the last such row in the file.
+        last_key = ""
+        while True:
+            batch = pd.read_sql('''
+                SELECT m.person_key AS PRIMARY_PERSON_KEY, m.age AS MEM_AGE, e.gender AS MEM_GENDER,
+                       MAX(printf('%s%012d', COALESCE(m.yearmo, ''), m.rowid)) AS latest
+                FROM members m
+                JOIN enrollment e ON e.person_key = m.person_key AND e.msa IS m.msa
+                WHERE m.person_key > ?
+                GROUP BY m.person_key
+                ORDER BY m.person_key
+                LIMIT ?
+            ''', staging, params=(last_key, batch_size))
+            if batch.empty:
+                break
+            last_key = batch["PRIMARY_PERSON_KEY"].iloc[-1]
+
+            result = upsert_patients(assign_demographics(batch, rng))
+            for key, value in result.items():
+                counts[key] += value
+            counts["rows"] += len(batch)
+            if progress:
+                progress(counts["rows"])
+
+        staging.close()
+
+    seconds = time.perf_counter() - start
+    counts["seconds"] = seconds
+    counts["rows_per_second"] = counts["rows"] / seconds if seconds else 0.0
+    return counts
+
+def main():
+    import argparse
+    import resource
+
+    from database import migrate
+
+    parser = argparse.ArgumentParser(description="Load Lokahi Members and Enrollment extracts into the patients table")
+    parser.add_argument("members", help="Members CSV file")
+    parser.add_argument("enrollment", help="Enrollment CSV file")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--seed", type=int, default=None, help="seed for the synthetic names and races")
+    args = parser.parse_args()
+
+    migrate()
+    report = ingest_members(args.members, args.enrollment, args.chunk_size, args.batch_size, seed=args.seed)
+
+    # ru_maxrss is reported in kilobytes on Linux
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"Processed {report['rows']} members in {report['seconds']:.1f}s: {report['inserted']} inserted, "
+          f"{report['updated']} updated, {report['skipped']} unchanged "
+          f"({report['rows_per_second']:.0f} rows/s, peak memory {peak_mb:.0f} MB)")
+
+if __name__ == "__main__":
+    main()
@@ -1,28 +1,37 @@
 import streamlit as st
-import bcrypt
 
-from style_helper import apply_header, apply_footer
-from database import initialize_database, get_user, add_user
+from style_helper import apply_header, apply_sidebar_logo, apply_footer
+from database import initialize_database
+from auth import authenticate, register_user, LoginThrottled, AuthBusyError
+from session import restore_session, start_session, end_session
 
-def login_page(col):
+def login_page(col, session):
     with col:
+      if session is not None:
+        st.info(f"You are logged in as {session['username']} ({session['role']}).")
+        if st.button("Log out"):
+            end_session()
+            st.rerun()
+        return
+
       username = st.text_input("Username")
       password = st.text_input("Password", type="password")
       if st.button("Login"):
-        user = get_user(username)
+        try:
+            user = authenticate(username, password, st.context.ip_address)
+        except (LoginThrottled, AuthBusyError) as e:
+            st.error(str(e))
+            return
           
         if user is not None:
-            if bcrypt.checkpw(password.encode(), user["password"]):
-                role = user[2]
-                st.session_state["role"] = role
-                st.success(f"Welcome {user[0]}. You are logged in as {role}")
-                
-                if role == "coach":
-                    st.switch_page("pages/member_info.py")
-                elif role == "caregiver":
-                    st.switch_page("pages/exercise_log.py")
-            else:
-                st.error("Invalid login.")
+            start_session(user)
+            role = user["role"]
+            st.success(f"Welcome {user['username']}. You are logged in as {role}")
+            
+            if role == "coach":
+                st.switch_page("pages/member_info.py")
+            elif role == "caregiver":
+                st.switch_page("pages/exercise_log.py")
         else:
             st.error("Invalid login.")
 
@@ -32,7 +41,11 @@ def register_page(col):
       password = st.text_input("Password", type="password")
       role = st.selectbox("Role", ["coach", "caregiver"])
       if st.button("Register"):
-        add_user(username, password, role)
+        try:
+            register_user(username, password, role)
+        except AuthBusyError as e:
+            st.error(str(e))
+            return
         st.success("User registered successfully!")
 
 def main():
@@ -40,18 +53,19 @@ def main():
 
     initialize_database()
 
-    # Session State for login
+    # Session State for login, restored from the session cookie after a reload
+    session = restore_session()
     if "role" not in st.session_state:
         st.session_state["role"] = None
     
     _, center, _ = st.columns([1,2,1])
     center.title("Mock Login")
 
-    st.sidebar.image("https://raw.githubusercontent.com/datjandra/kupuna/refs/heads/main/images/logo.png")
+    apply_sidebar_logo()
     st.sidebar.title("Actions")
     option = st.sidebar.radio("Choose Action", ["Login", "Register"])
     if option == "Login":
-        login_page(center)
+        login_page(center, session)
     else:
         register_page(center)
 
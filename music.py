@@ -0,0 +1,323 @@
+import streamlit as st
+import os
+import re
+import json
+import hashlib
+import datetime
+import numpy as np
+
+from collections import deque
+
+def normalize_text(text):
+    # Remove special characters and normalize spaces
+    return re.sub(r"[\u2018\u2019\u02BB']", "", text).lower()
+
+class MusicMatcher:
+    """
+    Aho-Corasick automaton over the normalized catalog titles.
+    One pass over a text finds every catalog title it contains, so matching
+    cost depends on the text length and the number of matches, not on the
+    size of the catalog.
+    """
+    def __init__(self, catalog):
+        self.titles = []
+        self.video_ids = []
+        self.lengths = []
+        # Trie nodes: outgoing edges, failure link, indexes of titles ending here,
+        # and the nearest node on the failure chain that ends a title
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [()]
+        self.output_link = [0]
+
+        for title, video_id in catalog.items():
+            pattern = normalize_text(title)
+            if not pattern:
+                continue
+            node = 0
+            for char in pattern:
+                next_node = self.goto[node].get(char)
+                if next_node is None:
+                    next_node = len(self.goto)
+                    self.goto[node][char] = next_node
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append(())
+                    self.output_link.append(0)
+                node = next_node
+            self.output[node] += (len(self.titles),)
+            self.titles.append(title)
+            self.video_ids.append(video_id)
+            self.lengths.append(len(pattern))
+
+        self._build_failure_links()
+
+    def _build_failure_links(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self.goto[node].items():
+                queue.append(child)
+                fallback = self.fail[node]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.goto[fallback].get(char, 0)
+                self.fail[child] = target
+                # Titles that end on the failure chain also end here
+                self.output_link[child] = target if self.output[target] else self.output_link[target]
+
+    def scan(self, normalized_text, state=0, offset=0):
+        """
+        Feed already normalized text into the automaton starting from state.
+        Returns (matches, state), where matches are (start position, title index)
+        pairs and offset is the position of normalized_text in the whole text.
+        """
+        goto = self.goto
+        fail = self.fail
+        output = self.output
+        output_link = self.output_link
+        matches = []
+        for position, char in enumerate(normalized_text, start=offset):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            node = state if output[state] else output_link[state]
+            while node:
+                for index in output[node]:
+                    matches.append((position - self.lengths[index] + 1, index))
+                node = output_link[node]
+        return matches, state
+
+    def match(self, text):
+        """
+        Return (title, video_id) for every catalog title found in text,
+        each once, in order of first appearance.
+        """
+        matches, _ = self.scan(normalize_text(text))
+        seen = set()
+        results = []
+        for _, index in sorted(matches):
+            if index not in seen:
+                seen.add(index)
+                results.append((self.titles[index], self.video_ids[index]))
+        return results
+
+class MusicScanner:
+    """
+    Incremental matcher for text that arrives in pieces, such as a streamed
+    playlist. Each title is reported once, as soon as its last character
+    has been fed.
+    """
+    def __init__(self, matcher):
+        self.matcher = matcher
+        self.state = 0
+        self.offset = 0
+        self.seen = set()
+
+    def feed(self, text):
+        normalized = normalize_text(text)
+        matches, self.state = self.matcher.scan(normalized, self.state, self.offset)
+        self.offset += len(normalized)
+
+        results = []
+        for _, index in matches:
+            if index not in self.seen:
+                self.seen.add(index)
+                results.append((self.matcher.titles[index], self.matcher.video_ids[index]))
+        return results
+
+@st.cache_resource
+def load_catalog():
+    # Dictionary of songs and their corresponding YouTube links
+    return json.loads(os.getenv('YOUTUBE_LINKS'))
+
+@st.cache_resource
+def get_music_matcher():
+    # Compiled once per process from the catalog
+    return MusicMatcher(load_catalog())
+
+def match_music_titles(text):
+    return get_music_matcher().match(text)
+
+def music_scanner():
+    return MusicScanner(get_music_matcher())
+
+# Decades covered by the era features
+ERA_DECADES = np.arange(1900, 2030, 10)
+# Age at which the songs a person remembers best were released
+MEMORY_BUMP_AGE = 20
+ERA_WEIGHT = 1.0
+TAG_WEIGHT = 1.5
+
+# Catalog tags favoured for each race on Create Routine and in member data
+DEFAULT_ETHNICITY_TAGS = {
+    "caucasian": ["american", "pop", "country"],
+    "white": ["american", "pop", "country"],
+    "black": ["soul", "motown", "jazz", "blues", "gospel"],
+    "native hawaiian or pacific islander": ["hawaiian", "pacific"],
+    "hawaiian": ["hawaiian", "pacific"],
+    "filipino": ["filipino", "opm"],
+    "portuguese": ["portuguese", "fado"],
+    "japanese": ["japanese", "enka"],
+    "chinese": ["chinese", "cantopop", "mandopop"],
+    "hispanic": ["latin", "bolero"],
+    "asian": ["japanese", "chinese", "filipino"],
+}
+
+def _tag_list(value):
+    if value is None:
+        return []
+    if isinstance(value, str):
+        value = [value]
+    return [normalize_text(str(tag)).strip() for tag in value if str(tag).strip()]
+
+def _era_year(value):
+    # Accepts 1958, "1958" or "1950s"
+    try:
+        return int(str(value).strip()[:4])
+    except ValueError:
+        return None
+
+def _era_vector(year):
+    # Soft decade membership so neighbouring decades still score
+    return np.exp(-0.5 * ((ERA_DECADES + 5 - year) / 10.0) ** 2)
+
+class MusicRecommender:
+    """
+    Ranks catalog songs for a listener profile without a model call.
+    Each song becomes a row of decade features (from its era tag) and tag
+    features (genre, origin and any other tags), normalized so a profile is
+    scored against the whole catalog with one matrix-vector product.
+    Only catalog entries with a video are indexed, so every recommendation
+    has a playable link.
+    """
+    def __init__(self, catalog, tags=None, ethnicity_tags=None):
+        tags = tags or {}
+        self.ethnicity_tags = {normalize_text(k): _tag_list(v) for k, v in (ethnicity_tags or DEFAULT_ETHNICITY_TAGS).items()}
+        self.titles = [title for title, video_id in catalog.items() if video_id]
+        self.video_ids = [catalog[title] for title in self.titles]
+
+        song_tags = []
+        vocabulary = {}
+        eras = []
+        for title in self.titles:
+            entry = tags.get(title) or {}
+            eras.append(_era_year(entry.get("era")) if entry.get("era") is not None else None)
+            names = []
+            for key, value in entry.items():
+                if key != "era":
+                    names += _tag_list(value)
+            song_tags.append(names)
+            for name in names:
+                vocabulary.setdefault(name, len(vocabulary))
+        self.vocabulary = vocabulary
+        # Without any era or tag the scores are only the tie-break jitter
+        self.tagged = bool(vocabulary) or any(year is not None for year in eras)
+
+        era_features = np.zeros((len(self.titles), len(ERA_DECADES)), dtype=np.float32)
+        tag_features = np.zeros((len(self.titles), len(vocabulary)), dtype=np.float32)
+        for row, (year, names) in enumerate(zip(eras, song_tags)):
+            if year is not None:
+                era_features[row] = _era_vector(year)
+            for name in names:
+                tag_features[row, vocabulary[name]] = 1.0
+        # One matrix with the weights baked in, so scoring is a single product
+        self.features = np.hstack([
+            ERA_WEIGHT * _normalize_rows(era_features),
+            TAG_WEIGHT * _normalize_rows(tag_features),
+        ]).astype(np.float32)
+        # Tie-break noise, far smaller than any real feature difference
+        self.jitter = np.random.default_rng(0).random(len(self.titles), dtype=np.float32) * 1e-3
+        self._profiles = {}
+
+    def profile_tags(self, ethnicity):
+        key = normalize_text(str(ethnicity)).strip()
+        return self.ethnicity_tags.get(key) or _tag_list(key.split())
+
+    def profile(self, age, gender, ethnicity):
+        """
+        Feature vector for a listener, laid out like the song rows, and the
+        jitter offset for the profile. Gender has no tag of its own in the
+        catalog; it only varies the order among ties.
+        """
+        key = (int(age), gender, ethnicity)
+        cached = self._profiles.get(key)
+        if cached is not None:
+            return cached
+
+        year = datetime.date.today().year - int(age) + MEMORY_BUMP_AGE
+        era = _era_vector(year)
+        tags = np.zeros(len(self.vocabulary))
+        for name in self.profile_tags(ethnicity):
+            index = self.vocabulary.get(name)
+            if index is not None:
+                tags[index] = 1.0
+        vector = np.concatenate([era / np.linalg.norm(era), tags / (np.linalg.norm(tags) or 1.0)]).astype(np.float32)
+
+        digest = hashlib.sha256(f"{age}\0{gender}\0{ethnicity}".encode()).digest()
+        offset = int.from_bytes(digest[:8], "big") % max(len(self.titles), 1)
+        if len(self._profiles) >= 4096:
+            self._profiles.clear()
+        self._profiles[key] = vector, offset
+        return vector, offset
+
+    def scores(self, age, gender, ethnicity):
+        # Similarity of every indexed song to the profile
+        vector, offset = self.profile(age, gender, ethnicity)
+        return self.features @ vector + np.roll(self.jitter, offset)
+
+    def recommend(self, age, gender, ethnicity, size=5):
+        """
+        Return the top (title, video_id) pairs for the profile, best first.
+        """
+        size = min(size, len(self.titles))
+        if size <= 0:
+            return []
+        scores = self.scores(age, gender, ethnicity)
+        top = np.argpartition(-scores, size - 1)[:size]
+        top = top[np.argsort(-scores[top])]
+        return [(self.titles[index], self.video_ids[index]) for index in top]
+
+    def sample(self, age, gender, ethnicity, size=5):
+        """
+        Return (title, video_id) pairs drawn from the catalog, the same ones
+        for the same profile. For catalogs without tags to rank by.
+        """
+        size = min(size, len(self.titles))
+        digest = hashlib.sha256(f"{int(age)}\0{gender}\0{ethnicity}".encode()).digest()
+        rng = np.random.default_rng(int.from_bytes(digest[:8], "big"))
+        picks = rng.choice(len(self.titles), size, replace=False)
+        return [(self.titles[index], self.video_ids[index]) for index in picks]
+
+def _normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+@st.cache_resource
+def load_music_tags():
+    # Optional tags per catalog title, e.g. {"Blue Hawaii": {"era": 1961, "genre": "hawaiian"}}
+    return json.loads(os.getenv('MUSIC_TAGS', '{}'))
+
+@st.cache_resource
+def get_music_recommender():
+    # Indexed once per process from the catalog and its tags
+    ethnicity_tags = json.loads(os.getenv('MUSIC_ETHNICITY_TAGS', 'null'))
+    return MusicRecommender(load_catalog(), load_music_tags(), ethnicity_tags)
+
+def recommend_music(age, gender, ethnicity, size=5):
+    return get_music_recommender().recommend(age, gender, ethnicity, size)
+
+def catalog_playlist(age, gender, ethnicity, size=5):
+    """
+    Playlist of recommended catalog songs, in the same numbered format as
+    the model's playlists. Used as the local source and as the fallback
+    when the model is slow or unavailable. Without MUSIC_TAGS there is
+    nothing to rank by, so the songs are a fixed sample per profile.
+    """
+    recommender = get_music_recommender()
+    if recommender.tagged:
+        picks = recommender.recommend(age, gender, ethnicity, size)
+    else:
+        picks = recommender.sample(age, gender, ethnicity, size)
+    return "\n".join(f"{i}. **{title}**" for i, (title, _) in enumerate(picks, start=1))
@@ -0,0 +1,203 @@
+import os
+import time
+import queue
+import threading
+
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+# Consecutive failures that trip a circuit, and how long it stays open
+OUTBOUND_FAILURE_THRESHOLD = int(os.getenv("OUTBOUND_FAILURE_THRESHOLD", "3"))
+OUTBOUND_RESET_SECONDS = float(os.getenv("OUTBOUND_RESET_SECONDS", "30"))
+OUTBOUND_WORKERS = int(os.getenv("OUTBOUND_WORKERS", "16"))
+# Longest a caller waits on another caller's in-flight request
+OUTBOUND_WAIT_SECONDS = float(os.getenv("OUTBOUND_WAIT_SECONDS", "60"))
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+    def wait(self, timeout=OUTBOUND_WAIT_SECONDS):
+        # Bounded, so a leader that never finishes cannot hang its waiters
+        if not self.done.wait(timeout):
+            raise TimeoutError(f"In-flight request did not finish within {timeout:g}s")
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+class SingleFlight:
+    """
+    Process-wide request coalescing. While a call for a key is in flight,
+    other callers with the same key wait for it and share its result (or
+    its exception) instead of calling upstream again.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    def begin(self, key):
+        """
+        Join the flight for key. Returns (call, leader); only the leader
+        does the work and must end it with finish().
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.coalesced += 1
+                return call, False
+            call = _Call()
+            self._calls[key] = call
+            self.leaders += 1
+            return call, True
+
+    def finish(self, key, call, result=None, error=None):
+        with self._lock:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+        call.result = result
+        call.error = error
+        call.done.set()
+
+    def do(self, key, func, *args, **kwargs):
+        call, leader = self.begin(key)
+        if not leader:
+            return call.wait()
+
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as e:
+            self.finish(key, call, error=e)
+            raise
+        self.finish(key, call, result=result)
+        return result
+
+    def stats(self):
+        with self._lock:
+            return {"leaders": self.leaders, "coalesced": self.coalesced, "in_flight": len(self._calls)}
+
+# Shared by every Streamlit session in this server process
+single_flight = SingleFlight()
+
+class CircuitOpenError(Exception):
+    pass
+
+class CircuitBreaker:
+    """
+    Trips open after failure_threshold consecutive failures and rejects
+    calls for reset_timeout seconds. Then one trial call is let through:
+    success closes the circuit, failure opens it again.
+    """
+    def __init__(self, name, failure_threshold=3, reset_timeout=30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+
+    @property
+    def state(self):
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                return "open"
+            return "half-open"
+
+    def before_call(self):
+        with self._lock:
+            if self.opened_at is None:
+                return
+            if time.monotonic() - self.opened_at < self.reset_timeout or self.trial_running:
+                raise CircuitOpenError(f"{self.name} circuit is open")
+            self.trial_running = True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def cancel(self):
+        # The caller gave up on its call without an outcome
+        with self._lock:
+            self.trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.trial_running or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self.trial_running = False
+
+# Runs blocking upstream calls so callers can stop waiting at their deadline
+_executor = ThreadPoolExecutor(max_workers=OUTBOUND_WORKERS, thread_name_prefix="outbound")
+
+class Upstream:
+    """
+    An external service with a latency budget and a circuit breaker.
+    call() and stream() raise TimeoutError when the budget runs out and
+    CircuitOpenError while the breaker is open; callers fall back on either.
+    """
+    def __init__(self, name, timeout, failure_threshold=OUTBOUND_FAILURE_THRESHOLD, reset_timeout=OUTBOUND_RESET_SECONDS):
+        self.name = name
+        self.timeout = timeout
+        self.breaker = CircuitBreaker(name, failure_threshold, reset_timeout)
+
+    def call(self, func, *args, **kwargs):
+        self.breaker.before_call()
+        future = _executor.submit(func, *args, **kwargs)
+        try:
+            result = future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            self.breaker.record_failure()
+            raise TimeoutError(f"{self.name} did not answer within {self.timeout}s")
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        self.breaker.record_success()
+        return result
+
+    def stream(self, func, *args, **kwargs):
+        """
+        Yield the items of the iterable returned by func(*args, **kwargs),
+        produced on a background thread, until the whole stream is done or
+        the budget is spent.
+        """
+        self.breaker.before_call()
+        deadline = time.monotonic() + self.timeout
+        items = queue.Queue()
+        done = object()
+
+        def produce():
+            try:
+                for item in func(*args, **kwargs):
+                    items.put((item, None))
+                items.put((done, None))
+            except Exception as e:
+                items.put((done, e))
+
+        threading.Thread(target=produce, daemon=True, name=f"outbound-{self.name}").start()
+        while True:
+            try:
+                item, error = items.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                self.breaker.record_failure()
+                raise TimeoutError(f"{self.name} did not finish within {self.timeout}s")
+            if error is not None:
+                self.breaker.record_failure()
+                raise error
+            if item is done:
+                self.breaker.record_success()
+                return
+            try:
+                yield item
+            except GeneratorExit:
+                self.breaker.cancel()
+                raise
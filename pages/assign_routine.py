@@ -1,32 +1,12 @@
 import streamlit as st
 import streamlit_shadcn_ui as ui
 
-from style_helper import apply_header, apply_footer
+from style_helper import apply_page_shell, apply_footer
 from database import fetch_patients, fetch_routines, assign_patient_to_routine
 
 def main():    
-    apply_header()
-    st.title("Assign Routine")
+    apply_page_shell("assign_routine")
 
-    st.markdown(
-      """
-      <div class="button-grid">
-          <a href="member_info" target="_self" class="button-card">
-            <p>Member Info</p>
-            <div class="icon">&#128117;</div>
-          </a>
-          <a href="create_routine" target="_self" class="button-card">
-            <p>Create Routine</p>
-            <div class="icon">&#x1F57A;</div>
-          </a>
-          <a href="exercise_routines" target="_self" class="button-card">
-            <p>View Routines</p>
-            <div class="icon">&#129488;</div>
-          </a>
-      </div>
-      """, unsafe_allow_html=True)
-
-    st.sidebar.image("https://raw.githubusercontent.com/datjandra/kupuna/refs/heads/main/images/logo.png")
     
     left, right = st.columns(2)
     # Display patients
@@ -1,56 +1,55 @@
 import streamlit as st
-import json
-import os
-import re
-import google.generativeai as genai
 import streamlit_shadcn_ui as ui
 
-from streamlit_player import st_player
-from style_helper import apply_header, card_container, apply_footer
+from style_helper import apply_page_shell, card_container, apply_footer
 from database import get_all_exercises, insert_routine
+from playlist import PLAYLIST_STREAMING, generate_playlist, stream_playlist
+from music import match_music_titles, music_scanner
+from videos import video_details, video_embed
 
-GEM_MODEL = os.getenv('GEM_MODEL')
-GOOGLE_API_KEY = os.getenv('GOOGLE_API_KEY')
-
-genai.configure(api_key=GOOGLE_API_KEY)
-model = genai.GenerativeModel(
-    GEM_MODEL,
-    generation_config={
-        "temperature": 0.3,
-        "top_k": 40,
-        "top_p": 0.95
-    }
-)
-
-# Dictionary of songs and their corresponding YouTube links
-youtube_links = json.loads(os.getenv('YOUTUBE_LINKS'))
-
-@st.cache_data
-def generate_playlist(age, gender, ethnicity):
-    PLAYLIST_PROMPT = os.getenv('PLAYLIST_PROMPT')
-    request = PLAYLIST_PROMPT.format(age=age, gender=gender, ethnicity=ethnicity)
-    response = model.generate_content(request)
-    return response.text
-
-@st.cache_data
-def normalize_text(text):
-    # Remove special characters and normalize spaces
-    return re.sub(r"[\u2018\u2019\u02BB']", "", text).lower()
+def st_player(url):
+    # streamlit_player is only needed when a video is not a lazy YouTube embed
+    from streamlit_player import st_player
+
+    st_player(url)
+
+def show_music_link(title, video_id):
+    st.write(title)
+    video_embed(f'https://www.youtube.com/watch?v={video_id}', title, player=st_player)
 
 def find_music_links(markdown_text):
     music_titles = []
-    
-    # Normalize markdown text for case-insensitive matching
-    markdown_text_normalized = normalize_text(markdown_text)
-
-    # Search for song titles in the markdown text
-    for title, video_id in youtube_links.items():
-        normalized_title = normalize_text(title)
-        if normalized_title in markdown_text_normalized:
-            # Print only if a match is found
-            st.write(title)
-            st_player(f'https://www.youtube.com/watch?v={video_id}')
-            music_titles.append(title)
+
+    # Render a player for each catalog song named in the playlist
+    for title, video_id in match_music_titles(markdown_text):
+        show_music_link(title, video_id)
+        music_titles.append(title)
+    return ", ".join(music_titles)
+
+def stream_music_links(age, gender, ethnicity, playlist_area, videos_area):
+    """
+    Render the playlist while it streams in, adding a player as soon as each
+    catalog title is complete. Falls back to the blocking call if the stream
+    fails before producing any text.
+    """
+    scanner = music_scanner()
+    playlist = ""
+    music_titles = []
+    try:
+        for chunk in stream_playlist(age, gender, ethnicity):
+            playlist += chunk
+            playlist_area.markdown(playlist)
+            for title, video_id in scanner.feed(chunk):
+                with videos_area:
+                    show_music_link(title, video_id)
+                music_titles.append(title)
+    except Exception:
+        if playlist:
+            raise
+        playlist = generate_playlist(age, gender, ethnicity)
+        playlist_area.markdown(playlist)
+        with videos_area:
+            return find_music_links(playlist)
     return ", ".join(music_titles)
 
 def routine_select(exercise_data):
@@ -74,32 +73,11 @@ def routine_select(exercise_data):
     return mobility_level, routine_length
 
 def main():
-    apply_header()
-    st.title("Create Exercise Routine")
-
-    st.markdown(
-      """
-      <div class="button-grid">
-          <a href="member_info" target="_self" class="button-card">
-            <p>Member Info</p>
-            <div class="icon">&#128117;</div>
-          </a>
-          <a href="assign_routine" target="_self" class="button-card">
-            <p>Assign Routine</p>
-            <div class="icon">&#128116;</div>
-          </a>
-          <a href="exercise_routines" target="_self" class="button-card">
-            <p>View Routines</p>
-            <div class="icon">&#129488;</div>
-          </a>
-      </div>
-      """, unsafe_allow_html=True)
+    apply_page_shell("create_routine")
 
     # Load exercise routines
     exercise_data = get_all_exercises()
 
-    st.sidebar.image("https://raw.githubusercontent.com/datjandra/kupuna/refs/heads/main/images/logo.png")
-    
     # Input fields for dementia subject's details
     st.sidebar.header("Kūpuna Details")
     age = st.sidebar.number_input("Age", min_value=18, max_value=120, value=65, step=1)
@@ -133,6 +111,7 @@ def main():
     if mobility_level and routine_length:
         st.header(f"Exercise Routine for {mobility_level} Mobility Level ({routine_length})")
         routine = exercise_data[mobility_level][routine_length]
+        videos = video_details([exercise['video'] for exercises in routine.values() for exercise in exercises])
     
         # Loop through each section and allow caregivers to select an exercise
         for phase, exercises in routine.items():
@@ -162,11 +141,11 @@ def main():
                     
                     # Display the video
                     if (len(exercises) > 1):
-                        st_player(exercise['video'])
+                        video_embed(exercise['video'], exercise['name'], videos.get(exercise['video']), player=st_player)
                     else:
                         _,center,_ = st.columns([1,2,1])
                         with center:
-                            st_player(exercise['video'])
+                            video_embed(exercise['video'], exercise['name'], videos.get(exercise['video']), player=st_player)
                         
         # Button to generate exercise routine
         if st.button("Create Routine"):
@@ -184,7 +163,7 @@ def main():
                     for section, exercise in selected_exercises.items():
                         st.markdown(f"**{section} - {exercise['name']}**")
                         st.markdown(f"*{exercise['description']}*")
-                        st.video(exercise['video'])
+                        video_embed(exercise['video'], exercise['name'], videos.get(exercise['video']))
         
                 with col2:
                     st.markdown("### 🎵 Therapeutic Music")
@@ -197,12 +176,16 @@ def main():
                     st.divider()  # Adds a horizontal divider for better structure
 
                     st.markdown("#### 🎶 Music Titles")
-                    playlist = generate_playlist(age, gender, ethnicity)
-                    st.markdown(playlist)
+                    playlist_area = st.empty()
                     st.divider()
 
                     st.markdown("#### 📺 Music Videos")
-                    music_titles = find_music_links(playlist)
+                    if PLAYLIST_STREAMING:
+                        music_titles = stream_music_links(age, gender, ethnicity, playlist_area, st.container())
+                    else:
+                        playlist = generate_playlist(age, gender, ethnicity)
+                        playlist_area.markdown(playlist)
+                        music_titles = find_music_links(playlist)
                     st.session_state["music_titles"] = music_titles
         
         # Form below the routine generation button
@@ -1,26 +1,10 @@
 import streamlit as st
 
-from style_helper import apply_header, apply_footer
+from style_helper import apply_page_shell, apply_footer
 
 def main():    
-    apply_header()
-    st.title("Understanding Dementia")
+    apply_page_shell("dementia_info")
 
-    st.markdown(
-      """
-      <div class="button-grid">
-          <a href="exercise_routines" target="_self" class="button-card">
-            <p>View Routines</p>
-            <div class="icon">&#129488;</div>
-          </a>
-          <a href="exercise_log" target="_self" class="button-card">
-            <p>Exercise Log</p>
-            <div class="icon">&#128200;</div>
-          </a>
-      </div>
-      """, unsafe_allow_html=True)
-
-    st.sidebar.image("https://raw.githubusercontent.com/datjandra/kupuna/refs/heads/main/images/logo.png")
     
     # Sidebar with links
     st.sidebar.header("Helpful Links")
@@ -1,37 +1,14 @@
 import streamlit as st
 import sqlite3
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
 import streamlit_shadcn_ui as ui
 
 from database import fetch_routines, fetch_patients, fetch_patient_routines, fetch_exercise_logs, insert_exercise_log
-from style_helper import apply_header, apply_footer
+from style_helper import apply_page_shell, apply_footer
+from garden import prerender_garden
 
 def main():
-    apply_header()
-
-    st.title("Exercise Log")
-
-    st.markdown(
-      """
-      <div class="button-grid">
-          <a href="exercise_routines" target="_self" class="button-card">
-            <p>View Routines</p>
-            <div class="icon">&#129488;</div>
-          </a>
-          <a href="virtual_garden" target="_self" class="button-card">
-            <p>Virtual Garden</p>
-            <div class="icon">&#127802;</div>
-          </a>
-          <a href="dementia_info" target="_self" class="button-card">
-            <p>Dementia Info</p>
-            <div class="icon">&#128106;</div>
-          </a>
-      </div>
-      """, unsafe_allow_html=True)
-
-    st.sidebar.image("https://raw.githubusercontent.com/datjandra/kupuna/refs/heads/main/images/logo.png")
+    apply_page_shell("exercise_log")
 
     # Fetch available routines and patients
     patients_df = fetch_patients()
@@ -63,6 +40,11 @@ def main():
 
         if not exercise_logs_copy.empty:
             exercise_logs_copy['date_time'] = pd.to_datetime(exercise_logs_copy['date_time'])
+
+            # Plotting libraries are loaded only when there is a chart to draw
+            import matplotlib.pyplot as plt
+            import seaborn as sns
+
             plt.figure(figsize=(10, 6))
             sns.lineplot(x='date_time', y='mood_level', data=exercise_logs_copy, marker='o', color='#FF3583')
             plt.title(f'Mood Level Over Time for {selected_patient_name} - {selected_routine_name}')
@@ -96,6 +78,8 @@ def main():
                                 key="routine_created_dialog")
             else:
                 insert_exercise_log(selected_patient_id, selected_routine_id, date_input, duration_input, mood_level_input, comments_input)
+                # Warm the Virtual Garden for the new session count and streak
+                prerender_garden(selected_patient_id, selected_routine_id)
                 st.sidebar.success('Exercise log saved successfully!')
                 st.rerun()
                 
@@ -2,84 +2,27 @@ import streamlit as st
 import streamlit_shadcn_ui as ui
 import pandas as pd
 
-from database import fetch_routines, get_exercises_for_routine
-from style_helper import apply_header, apply_footer
+from database import get_routine_catalog
+from style_helper import apply_page_shell, apply_footer
+from videos import video_details, video_embed
 
 def main():    
-    apply_header()
+    apply_page_shell("exercise_routines")
 
-    st.title("Exercise Routines")
+    # All routines with their exercises, indexed by id
+    catalog = get_routine_catalog()
 
-    role = st.session_state.get("role", None)
-
-    # Conditional display of buttons based on role
-    if role == "coach":
-        st.markdown(
-            """
-            <div class="button-grid">
-                <a href="create_routine" target="_self" class="button-card">
-                    <p>Create Routine</p>
-                    <div class="icon">&#x1F57A;</div>
-                </a>
-                <a href="assign_routine" target="_self" class="button-card">
-                    <p>Assign Routine</p>
-                    <div class="icon">&#128116;</div>
-                </a>
-            </div>
-            """,
-            unsafe_allow_html=True,
-        )
-    elif role == "caregiver":
-        st.markdown(
-            """
-            <div class="button-grid">
-                <a href="exercise_log" target="_self" class="button-card">
-                    <p>Exercise Log</p>
-                    <div class="icon">&#128200;</div>
-                </a>
-                <a href="dementia_info" target="_self" class="button-card">
-                    <p>Dementia Info</p>
-                    <div class="icon">&#128106;</div>
-                </a>
-            </div>
-            """,
-            unsafe_allow_html=True,
-        )
-    else:
-        st.markdown(
-          """
-          <div class="button-grid">
-              <a href="create_routine" target="_self" class="button-card">
-                <p>Create Routine</p>
-                <div class="icon">&#x1F57A;</div>
-              </a>
-              <a href="assign_routine" target="_self" class="button-card">
-                <p>Assign Routine</p>
-                <div class="icon">&#128116;</div>
-              </a>
-              <a href="exercise_log" target="_self" class="button-card">
-                <p>Exercise Log</p>
-                <div class="icon">&#128200;</div>
-              </a>
-          </div>
-          """, unsafe_allow_html=True)
-
-    # Fetch all routines
-    routines = fetch_routines()
-
-    st.sidebar.image("https://raw.githubusercontent.com/datjandra/kupuna/refs/heads/main/images/logo.png")
-    
     # Display routine selection
-    if not routines.empty:
+    if len(catalog):
         routine_id = st.sidebar.selectbox(
             "Select a Routine",
-            options=routines["id"],
-            format_func=lambda rid: routines.loc[routines["id"] == rid, "name"].values[0]
+            options=catalog.ids,
+            format_func=catalog.name
         )
         
-        # Fetch and display routine details and exercises
+        # Display routine details and exercises
         if routine_id:
-            routine_details = routines.loc[routines["id"] == routine_id].iloc[0]
+            routine_details = catalog[routine_id]
             st.subheader(f"Routine: {routine_details['name']}")
 
             # Display routine description if available
@@ -90,24 +33,21 @@ def main():
             if routine_details["music"]:
                 st.markdown(f"**Music:** {routine_details['music']}")
             
-            # Fetch and display exercises for the selected routine
-            exercises = get_exercises_for_routine(routine_id)
+            # Exercises come sorted by phase
+            exercises = routine_details["exercises"]
             
             st.subheader("Exercises")
-            if not exercises.empty:
-                phase_order = ["Warm-Up", "Movements", "Cool-Down and Closing"]
-                exercises["phase"] = pd.Categorical(exercises["phase"], categories=phase_order, ordered=True)
-
-                exercises_sorted = exercises.sort_values("phase")
-                ui.table(data=exercises_sorted)
+            if exercises:
+                ui.table(data=pd.DataFrame(exercises))
+                videos = video_details([exercise["video"] for exercise in exercises if exercise["video"]])
                 
-                for _, exercise in exercises_sorted.iterrows():
+                for exercise in exercises:
                     st.markdown(f"### {exercise['name']} ({exercise['phase']})")
                     st.write(exercise["description"])
                     if exercise["video"]:
                         _,center,_ = st.columns([1,2,1])
                         with center:
-                            st.video(exercise['video'])
+                            video_embed(exercise['video'], exercise['name'], videos.get(exercise['video']))
             else:
                 st.write("No exercises found for this routine.")
     else:
@@ -1,161 +1,13 @@
 import streamlit as st
-import pandas as pd
-import random
 import io
 import streamlit_shadcn_ui as ui
 
-from style_helper import apply_header, apply_footer
-from database import fetch_patients, bulk_insert_patient
-
-# Define race categories and ethnicity mapping
-race_categories = [
-    "Caucasian", "Black", "Native Hawaiian or Pacific Islander", "Portuguese",
-    "Filipino", "Japanese", "Chinese"
-]
-
-ethnicity_mapping = {
-    "Caucasian": 2,  # Not Hispanic
-    "Black": 3,
-    "Native Hawaiian or Pacific Islander": 3,  # Unknown
-    "Portuguese": 2,  # Not Hispanic
-    "Filipino": 1,  # Hispanic
-    "Japanese": 3,  # Unknown
-    "Chinese": 3    # Unknown
-}
-
-# Fill missing MEM_RACE and set MEM_ETHNICITY
-def assign_race_ethnicity(row):
-    race = random.choice(race_categories)
-    ethnicity = ethnicity_mapping[race]
-    # return pd.Series([race, ethnicity])
-    return race, ethnicity
-
-# Set NAME based on MEM_GENDER, MEM_RACE, MEM_ETHNICITY
-def assign_name(row):
-    # Gender-specific names for each race and ethnicity
-    race_to_name = {
-        "Caucasian": {
-            "M": [
-                "Alexander Baldwin", "Henry Perrine", "Ethan Taylor", 
-                "William Scott", "James Hunter"
-            ] if row["MEM_ETHNICITY"] == 2 else [
-                "Juan Garcia", "Carlos Diaz", "Miguel Torres", 
-                "Luis Ramirez", "Pedro Sanchez"
-            ],
-            "F": [
-                "Emily Cooke", "Olivia Brown", "Sophia Harris", 
-                "Emma Thompson", "Charlotte Evans"
-            ] if row["MEM_ETHNICITY"] == 2 else [
-                "Maria Gonzalez", "Isabella Martinez", "Ana Lopez", 
-                "Lucia Morales", "Elena Navarro"
-            ]
-        },
-        "Native Hawaiian or Pacific Islander": {
-            "M": [
-                "Mike Malu", "Noah Kaipo", "Lani Kealoha", 
-                "Kimo Hekili", "Koa Malakai"
-            ],
-            "F": [
-                "Leilani Aloha", "Moana Kea", "Jennifer Lani", 
-                "Hina Kaleo", "Debbie Makana"
-            ]
-        },
-        "Portuguese": {
-            "M": [
-                "Antonio Silva", "Manuel Sousa", "Joao Mendes", 
-                "Carlos Almeida", "Francisco Moreira"
-            ],
-            "F": [
-                "Sofia Costa", "Isabel Ferreira", "Ana Oliveira", 
-                "Catarina Rocha", "Teresa Pires"
-            ]
-        },
-        "Filipino": {
-            "M": [
-                "Jose Rizal", "Andres Bonifacio", "Manuel Quezon", 
-                "Ramon Magsaysay", "Lapu-Lapu"
-            ],
-            "F": [
-                "Maria Clara", "Gabriela Silang", "Corazon Aquino", 
-                "Imelda Santos", "Jocelyn Cruz"
-            ]
-        },
-        "Japanese": {
-            "M": [
-                "Greg Tanaka", "Hiroshi Yamamoto", "Steve Suzuki", 
-                "Kenji Takeda", "Kevin Kobayashi"
-            ],
-            "F": [
-                "Mary Sato", "Akiko Nakamura", "Eunice Takahashi", 
-                "Hana Matsumoto", "Yuki Fujimoto"
-            ]
-        },
-        "Chinese": {
-            "M": [
-                "David Zhang", "Li Wei", "John Wang", 
-                "Kevin Chen", "Tony Huang"
-            ],
-            "F": [
-                "Lillian Mei", "Xiao Hong", "Julia Yi", 
-                "Angela Lin", "Grace Liu"
-            ]
-        },
-        "Black": {
-            "M": [
-                "James Brown", "Michael Johnson", "William Robinson", 
-                "David Carter", "Joseph Harris"
-            ],
-            "F": [
-                "Ava Jackson", "Emma Washington", "Sophia Jefferson", 
-                "Olivia Brooks", "Maya Scott"
-            ]
-        }
-    }
-
-    # Default name if gender or race is unknown
-    default_name = "Taylor Morgan"
-
-    # Get race-based names
-    race_names = race_to_name.get(row["MEM_RACE"], {})
-    # Get gender-specific names, or use default if not available
-    gender_names = race_names.get(row["MEM_GENDER"], [default_name])
-    
-    # Randomly pick a name from the list
-    return random.choice(gender_names)
-
-def clean_csv_data(csv_data: str) -> pd.DataFrame:
-    try:
-        # Read the CSV data into a DataFrame
-        csv_io = io.StringIO(csv_data)
-        df = pd.read_csv(csv_io)
-
-        # Clean each cell in the DataFrame
-        for col in df.columns:
-            df[col] = df[col].apply(lambda x: x.strip() if isinstance(x, str) else x)
-
-        return df
-    except Exception as e:
-        raise ValueError(f"Failed to clean CSV data: {e}")
+from style_helper import apply_page_shell, apply_footer
+from database import fetch_patients
+from ingest import ingest_members
 
 def main():    
-    apply_header()
-    st.title("Member Info")
-
-    st.markdown(
-      """
-      <div class="button-grid">
-          <a href="create_routine" target="_self" class="button-card">
-            <p>Create Routine</p>
-            <div class="icon">&#x1F57A;</div>
-          </a>
-          <a href="assign_routine" target="_self" class="button-card">
-            <p>Assign Routine</p>
-            <div class="icon">&#128116;</div>
-          </a>
-      </div>
-      """, unsafe_allow_html=True)
-
-    st.sidebar.image("https://raw.githubusercontent.com/datjandra/kupuna/refs/heads/main/images/logo.png")
+    apply_page_shell("member_info")
 
     # Add instructions in the sidebar
     st.sidebar.title("Adding Members")
@@ -189,6 +41,11 @@ def main():
     
     ---
     
+    #### Large Extracts
+    For full Members and Enrollment extracts, upload both CSV files instead of pasting. Uploaded files are processed in chunks, so any size can be loaded.
+    
+    ---
+    
     #### Step 3: Submit the Data
     1. After pasting both CSV contents into the respective fields, click the **Insert Members** button.
     2. The app will process the data, create random names and races, and insert the corresponding records into the database.
@@ -211,6 +68,13 @@ def main():
     st.header('Kūpunas')
     patients_df = fetch_patients()
     ui.table(data=patients_df)
+
+    report = st.session_state.pop("ingest_report", None)
+    if report:
+        st.success(
+            f"Processed {report['rows']} members in {report['seconds']:.1f}s ({report['rows_per_second']:.0f} rows/s): "
+            f"{report['inserted']} inserted, {report['updated']} updated, {report['skipped']} unchanged."
+        )
     
     members = """
     PRIMARY_PERSON_KEY,MEMBER_ID,MEMBER_MONTH_START_DATE,YEARMO,MEM_AGE,RELATION,MEM_MSA_NAME,PAYER_LOB,PAYER_TYPE,PROD_TYPE,QTY_MM_MD,QTY_MM_RX,QTY_MM_DN,QTY_MM_VS,MEM_STAT,PRIMARY_CHRONIC_CONDITION_ROLLUP_ID,PRIMARY_CHRONIC_CONDITION_ROLLUP_DESC
@@ -242,42 +106,33 @@ def main():
     """
     enrollment_csv = st.text_area("Enrollment", value=enrollment.strip(), height=300)
 
+    # Full extracts are uploaded as files and streamed instead of pasted
+    left, right = st.columns(2)
+    members_file = left.file_uploader("Members CSV file", type="csv")
+    enrollment_file = right.file_uploader("Enrollment CSV file", type="csv")
+
     insert_members = st.button("Insert Members")
     
     apply_footer()
     
     if insert_members:
-        members_df = clean_csv_data(members_csv)
-        enrollment_df = clean_csv_data(enrollment_csv)
-
-        # Perform the filtering
-        filtered_members_df = members_df.merge(
-            enrollment_df,
-            on=["PRIMARY_PERSON_KEY", "MEM_MSA_NAME"],
-            how="inner"
+        if bool(members_file) != bool(enrollment_file):
+            # The pasted text would otherwise stand in for the missing file
+            st.error("Upload both the Members and the Enrollment CSV files, or neither to use the text above.")
+            return
+
+        if members_file and enrollment_file:
+            members_source, enrollment_source = members_file, enrollment_file
+        else:
+            members_source, enrollment_source = io.StringIO(members_csv), io.StringIO(enrollment_csv)
+
+        progress = st.empty()
+        report = ingest_members(
+            members_source,
+            enrollment_source,
+            progress=lambda rows: progress.text(f"Processed {rows} members...")
         )
-    
-        # Merge datasets on PRIMARY_PERSON_KEY
-        merged_data = pd.merge(filtered_members_df, enrollment_df, on="PRIMARY_PERSON_KEY", how="inner")
-    
-        merged_data[["MEM_RACE", "MEM_ETHNICITY"]] = merged_data.apply(assign_race_ethnicity, axis=1).apply(pd.Series)
-
-        if "MEM_GENDER_x" in merged_data.columns and merged_data["MEM_GENDER_x"].notna().any():
-            merged_data.rename(columns={"MEM_GENDER_x": "MEM_GENDER"}, inplace=True)
-        elif "MEM_GENDER_y" in merged_data.columns and merged_data["MEM_GENDER_y"].notna().any:
-            merged_data.rename(columns={"MEM_GENDER_y": "MEM_GENDER"}, inplace=True)
-        
-        merged_data["NAME"] = merged_data.apply(assign_name, axis=1)
-
-        if "MEM_AGE_x" in merged_data.columns:
-            merged_data.rename(columns={"MEM_AGE_x": "MEM_AGE"}, inplace=True)
-        elif "MEM_AGE_y" in merged_data.columns:
-            merged_data.rename(columns={"MEM_AGE_y": "MEM_AGE"}, inplace=True)
-
-        # Select only the required columns
-        final_data = merged_data[["PRIMARY_PERSON_KEY", "NAME", "MEM_AGE", "MEM_GENDER", "MEM_RACE", "MEM_ETHNICITY"]]
-
-        bulk_insert_patient(final_data)
+        st.session_state["ingest_report"] = report
         st.rerun()
 
 if __name__ == "__main__":
@@ -1,39 +1,12 @@
 import streamlit as st
 import streamlit_shadcn_ui as ui
-import os
-import urllib.parse
-from PIL import Image
-import requests
-from io import BytesIO
 
-from style_helper import apply_header, apply_footer
+from style_helper import apply_page_shell, apply_footer
 from database import get_exercise_stats, fetch_patient_routines
-
-IMAGE_GEN_API = os.getenv('IMAGE_GEN_API')
-IMAGE_GEN_PROMPT = os.getenv('IMAGE_GEN_PROMPT')
-
-def load_image(url):
-    response = requests.get(url)
-    response.raise_for_status()  # Ensure the request was successful
-    return Image.open(BytesIO(response.content))
+from garden import garden_image
 
 def main():    
-    apply_header()
-    st.title("Virtual Garden")
-
-    st.markdown(
-      """
-      <div class="button-grid">
-          <a href="exercise_routines" target="_self" class="button-card">
-            <p>View Routines</p>
-            <div class="icon">&#129488;</div>
-          </a>
-          <a href="exercise_log" target="_self" class="button-card">
-            <p>Exercise Log</p>
-            <div class="icon">&#128200;</div>
-          </a>
-      </div>
-      """, unsafe_allow_html=True)
+    apply_page_shell("virtual_garden")
 
     st.divider()
     st.markdown("""
@@ -41,8 +14,6 @@ def main():
     🌸 The number of flowers in the garden are proportional to the number of exercise sessions, and the number of vibrant trees reflects the longest streak of consecutive days exercising. 
     Watch the garden flourish as the kūpuna stays active! 🌱
     """)
-    
-    st.sidebar.image("https://raw.githubusercontent.com/datjandra/kupuna/refs/heads/main/images/logo.png")
 
     patient_routines_df = fetch_patient_routines()
     
@@ -74,18 +45,11 @@ def main():
         with cols[1]:
           ui.metric_card(title="Longest Streak", content=longest_streak, key="longest-streak")
 
-        formatted_prompt = urllib.parse.quote(IMAGE_GEN_PROMPT.format(total_sessions=total_sessions, longest_streak=longest_streak))
-        image_link = f"{IMAGE_GEN_API}{formatted_prompt}"
-
         _,center,_ = st.columns([1,2,1])
         with st.spinner("Loading your garden..."):
-            try:
-                image = load_image(image_link)
-                with center:
-                    st.image(image, use_container_width=True)
-            except Exception as e:
-                with center:
-                    st.image(image_link, use_container_width=True)
+            image = garden_image(total_sessions, longest_streak, selected_patient_id)
+            with center:
+                st.image(image, use_container_width=True)
 
     apply_footer()
     
@@ -0,0 +1,451 @@
+import streamlit as st
+import pandas as pd
+import os
+import time
+import random
+import hashlib
+import logging
+import sqlite3
+import threading
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from database import DB_PATH, ConnectionPool
+from music import catalog_playlist, recommend_music, get_music_recommender
+from outbound import Upstream, single_flight
+
+GEM_MODEL = os.getenv('GEM_MODEL')
+GOOGLE_API_KEY = os.getenv('GOOGLE_API_KEY')
+PLAYLIST_PROMPT = os.getenv('PLAYLIST_PROMPT')
+
+# Disk cache next to kupuna.db, shared by every worker and kept across restarts
+PLAYLIST_CACHE_PATH = os.getenv(
+    "PLAYLIST_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(DB_PATH)), "playlist_cache.db")
+)
+PLAYLIST_CACHE_TTL = int(os.getenv("PLAYLIST_CACHE_TTL", str(30 * 24 * 3600)))
+PLAYLIST_CACHE_MAX_ENTRIES = int(os.getenv("PLAYLIST_CACHE_MAX_ENTRIES", "5000"))
+# Ages within the same bucket share a playlist; 1 keeps exact ages
+PLAYLIST_AGE_BUCKET = int(os.getenv("PLAYLIST_AGE_BUCKET", "1"))
+# "model" asks Gemini, "local" uses the catalog recommender only, and
+# "hybrid" asks Gemini to choose among the recommender's top candidates.
+# local and hybrid need MUSIC_TAGS; without them "model" is used.
+PLAYLIST_SOURCE = os.getenv("PLAYLIST_SOURCE", "model").lower()
+PLAYLIST_CANDIDATES = int(os.getenv("PLAYLIST_CANDIDATES", "25"))
+# Sent instead of PLAYLIST_PROMPT in hybrid mode
+PLAYLIST_HYBRID_PROMPT = os.getenv(
+    "PLAYLIST_HYBRID_PROMPT",
+    "Pick the 5 songs from this list best suited to an exercise session for a {age} year old "
+    "{gender} {ethnicity} kūpuna. Reply with a numbered list of the titles in bold, nothing else.\n{candidates}"
+)
+# Shown when the model fails and the catalog cannot stand in for it
+PLAYLIST_UNAVAILABLE = "Music suggestions are unavailable right now. Please try again later."
+# Latency budget for one playlist generation, streamed or not
+PLAYLIST_TIMEOUT = float(os.getenv("PLAYLIST_TIMEOUT", "20"))
+# Render the playlist as the model produces it; "false" waits for the full text
+PLAYLIST_STREAMING = os.getenv("PLAYLIST_STREAMING", "true").lower() != "false"
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+class FakeModel:
+    """
+    Offline stand-in for the Gemini model, selected with GEM_MODEL=fake.
+    Returns a deterministic playlist built from the request and counts its
+    calls. latency delays the first token and token_delay spaces the
+    following ones; the blocking call waits for all of them.
+    """
+    def __init__(self, titles=None, latency=0.0, token_delay=0.0, size=3, failure_rate=0.0):
+        self.titles = titles or ["Aloha 'Oe", "Moon River", "What a Wonderful World"]
+        self.latency = latency
+        self.token_delay = token_delay
+        self.size = size
+        self.failure_rate = failure_rate
+        self.calls = 0
+
+    def _playlist(self, request):
+        digest = int(hashlib.sha256(request.encode()).hexdigest(), 16)
+        picks = [self.titles[(digest + i) % len(self.titles)] for i in range(self.size)]
+        return "\n".join(f"{i}. **{title}**" for i, title in enumerate(picks, start=1))
+
+    def _stream(self, text):
+        time.sleep(self.latency)
+        for i, token in enumerate(text.split(" ")):
+            if i:
+                time.sleep(self.token_delay)
+            yield FakeResponse(token if i == 0 else " " + token)
+
+    def generate_content(self, request, stream=False):
+        self.calls += 1
+        if self.failure_rate and random.random() < self.failure_rate:
+            raise RuntimeError("FakeModel: simulated upstream failure")
+        chunks = self._stream(self._playlist(request))
+        if stream:
+            return chunks
+        return FakeResponse("".join(chunk.text for chunk in chunks))
+
+@st.cache_resource
+def get_model():
+    if GEM_MODEL == "fake":
+        return FakeModel()
+
+    # Imported on first use; the client library is slow to load
+    import google.generativeai as genai
+
+    genai.configure(api_key=GOOGLE_API_KEY)
+    return genai.GenerativeModel(
+        GEM_MODEL,
+        generation_config={
+            "temperature": 0.3,
+            "top_k": 40,
+            "top_p": 0.95
+        }
+    )
+
+logger = logging.getLogger(__name__)
+
+@st.cache_resource
+def playlist_source():
+    """
+    The source actually used: PLAYLIST_SOURCE, except that local and
+    hybrid fall back to the model when the catalog has no tags to rank by.
+    """
+    if PLAYLIST_SOURCE in ("local", "hybrid") and not get_music_recommender().tagged:
+        logger.warning("PLAYLIST_SOURCE=%s needs MUSIC_TAGS for the catalog; using the model instead", PLAYLIST_SOURCE)
+        return "model"
+    return PLAYLIST_SOURCE
+
+def fallback_playlist(age, gender, ethnicity):
+    return catalog_playlist(age, gender, ethnicity) or PLAYLIST_UNAVAILABLE
+
+def _normalize(value):
+    return " ".join(str(value).split()).casefold()
+
+def playlist_key(age, gender, ethnicity, age_bucket=None):
+    """
+    Cache key for a playlist request: the normalized inputs plus a hash of
+    the prompt, model and source, so changing any of them starts a fresh cache.
+    """
+    age_bucket = age_bucket or PLAYLIST_AGE_BUCKET
+    source = playlist_source()
+    prompt = PLAYLIST_HYBRID_PROMPT if source == "hybrid" else PLAYLIST_PROMPT
+    prompt_hash = hashlib.sha256(f"{prompt}\0{GEM_MODEL}\0{source}".encode()).hexdigest()[:16]
+    bucketed_age = int(age) // age_bucket * age_bucket
+    return f"{prompt_hash}:{bucketed_age}:{_normalize(gender)}:{_normalize(ethnicity)}"
+
+def playlist_request(age, gender, ethnicity):
+    if playlist_source() == "hybrid":
+        # The model only ranks a short candidate list instead of recalling
+        # songs, so its answer is brief and every title it picks has a video
+        candidates = recommend_music(age, gender, ethnicity, PLAYLIST_CANDIDATES)
+        return PLAYLIST_HYBRID_PROMPT.format(
+            age=age, gender=gender, ethnicity=ethnicity,
+            candidates="\n".join(f"- {title}" for title, _ in candidates),
+        )
+    return PLAYLIST_PROMPT.format(age=age, gender=gender, ethnicity=ethnicity)
+
+class PlaylistCache:
+    """
+    SQLite-backed playlist cache with a TTL and least-recently-used eviction
+    once more than max_entries playlists are stored.
+    """
+    def __init__(self, path=PLAYLIST_CACHE_PATH, ttl=PLAYLIST_CACHE_TTL, max_entries=PLAYLIST_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # Shared by every rerun thread, like the main database's connections
+        self._pool = ConnectionPool(path)
+        with self._pool.connection() as conn:
+            conn.execute('''
+            CREATE TABLE IF NOT EXISTS playlists (
+                key TEXT PRIMARY KEY,
+                playlist TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            ''')
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_playlists_accessed ON playlists (accessed_at)")
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def contains(self, key):
+        # Presence check that does not touch the hit/miss counters or LRU order
+        with self._pool.connection() as conn:
+            row = conn.execute(
+                "SELECT 1 FROM playlists WHERE key = ? AND created_at > ?", (key, time.time() - self.ttl)
+            ).fetchone()
+        return row is not None
+
+    def get(self, key):
+        now = time.time()
+        with self._pool.connection() as conn:
+            row = conn.execute(
+                "SELECT playlist FROM playlists WHERE key = ? AND created_at > ?", (key, now - self.ttl)
+            ).fetchone()
+            self._count(row is not None)
+            if row is None:
+                return None
+
+            conn.execute("UPDATE playlists SET accessed_at = ? WHERE key = ?", (now, key))
+        return row[0]
+
+    def put(self, key, playlist):
+        now = time.time()
+        with self._pool.transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO playlists (key, playlist, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, playlist, now, now)
+            )
+            conn.execute("DELETE FROM playlists WHERE created_at <= ?", (now - self.ttl,))
+            conn.execute('''
+            DELETE FROM playlists WHERE key IN (
+                SELECT key FROM playlists ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+            )
+            ''', (self.max_entries,))
+
+    def stats(self):
+        with self._pool.connection() as conn:
+            entries = conn.execute("SELECT COUNT(*) FROM playlists").fetchone()[0]
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": entries}
+
+playlist_cache = PlaylistCache()
+playlist_upstream = Upstream("playlist", PLAYLIST_TIMEOUT)
+
+def _call_model(key, model, request):
+    # A caller that just missed the previous flight finds its result cached
+    playlist = playlist_cache.get(key)
+    if playlist is not None:
+        return playlist
+
+    text = playlist_upstream.call(lambda: model.generate_content(request).text)
+    try:
+        playlist_cache.put(key, text)
+    except sqlite3.Error as e:
+        # The waiters still get the playlist; the next request generates it again
+        logger.warning("Could not cache playlist %s: %s", key, e)
+    return text
+
+def fetch_playlist(age, gender, ethnicity):
+    """
+    Return the playlist from the disk cache, or generate it within the
+    playlist latency budget. Concurrent identical requests from any session
+    share a single model call. Raises when the model fails, times out or
+    its circuit is open.
+    """
+    key = playlist_key(age, gender, ethnicity)
+    playlist = playlist_cache.get(key)
+    if playlist is not None:
+        return playlist
+
+    request = playlist_request(age, gender, ethnicity)
+    return single_flight.do(("playlist", key), _call_model, key, get_model(), request)
+
+@st.cache_data
+def _generate_playlist(age, gender, ethnicity):
+    return fetch_playlist(age, gender, ethnicity)
+
+def generate_playlist(age, gender, ethnicity):
+    if playlist_source() == "local":
+        return catalog_playlist(age, gender, ethnicity)
+
+    # Fallbacks are not memoized, so the model is tried again on the next run
+    try:
+        return _generate_playlist(age, gender, ethnicity)
+    except Exception:
+        return fallback_playlist(age, gender, ethnicity)
+
+def stream_playlist(age, gender, ethnicity):
+    """
+    Yield the playlist text in pieces as the model produces them.
+    A cached playlist comes back as a single piece; a fully streamed one
+    is stored in the playlist cache. A request that arrives while the same
+    playlist is already being generated waits for it and gets one piece.
+    If the model fails before producing any text the catalog fallback is
+    yielded instead; a failure mid-stream ends the playlist early.
+    """
+    if playlist_source() == "local":
+        yield catalog_playlist(age, gender, ethnicity)
+        return
+
+    key = playlist_key(age, gender, ethnicity)
+    playlist = playlist_cache.get(key)
+    if playlist is not None:
+        yield playlist
+        return
+
+    flight_key = ("playlist", key)
+    call, leader = single_flight.begin(flight_key)
+    if not leader:
+        try:
+            playlist = call.wait(PLAYLIST_TIMEOUT)
+        except Exception:
+            playlist = fallback_playlist(age, gender, ethnicity)
+        yield playlist
+        return
+
+    chunks = []
+    try:
+        request = playlist_request(age, gender, ethnicity)
+        model = get_model()
+        for chunk in playlist_upstream.stream(model.generate_content, request, stream=True):
+            chunks.append(chunk.text)
+            yield chunk.text
+    except Exception as e:
+        single_flight.finish(flight_key, call, error=e)
+        if not chunks:
+            yield fallback_playlist(age, gender, ethnicity)
+        return
+    except BaseException:
+        # The page stopped reading mid-stream; release the waiters
+        single_flight.finish(flight_key, call, error=RuntimeError("Playlist stream was abandoned"))
+        raise
+
+    playlist = "".join(chunks)
+    # Release the waiters before storing, so a failed write cannot strand them
+    single_flight.finish(flight_key, call, result=playlist)
+    try:
+        playlist_cache.put(key, playlist)
+    except sqlite3.Error as e:
+        # Already shown in full; the next request generates it again
+        logger.warning("Could not cache playlist %s: %s", key, e)
+
+# Patient gender codes mapped to the labels used on Create Routine
+GENDER_LABELS = {"M": "Kāne (Male)", "F": "Wahine (Female)"}
+
+class RateLimiter:
+    """
+    Token bucket shared by the prefetch workers: at most rate calls per
+    second on average, with bursts of up to burst calls.
+    """
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+def _generate_with_retries(model, request, limiter, retries, backoff):
+    for attempt in range(retries + 1):
+        limiter.acquire()
+        try:
+            return model.generate_content(request).text
+        except Exception:
+            if attempt == retries:
+                raise
+            # Exponential backoff with jitter
+            time.sleep(backoff * 2 ** attempt * random.uniform(0.5, 1.5))
+
+def prefetch_playlists(patients, workers=4, rate=2.0, retries=3, backoff=1.0, model=None):
+    """
+    Generate playlists for every distinct (age bucket, gender, race) among
+    patients and store them in the playlist cache, so Create Routine finds
+    them without a live model call.
+
+    Calls run on a bounded thread pool behind a shared rate limiter, and
+    each one is retried with exponential backoff. Returns a report dict.
+    """
+    model = model or get_model()
+    start = time.perf_counter()
+
+    jobs = {}
+    cached = 0
+    for age, gender, race in patients[["age", "gender", "race"]].itertuples(index=False):
+        if pd.isna(age) or pd.isna(race):
+            continue
+        gender = GENDER_LABELS.get(gender, gender)
+        key = playlist_key(age, gender, race)
+        if key in jobs:
+            continue
+        if playlist_cache.contains(key):
+            jobs[key] = None
+            cached += 1
+        else:
+            jobs[key] = (int(age), gender, race)
+
+    limiter = RateLimiter(rate, burst=workers)
+    generated = 0
+    errors = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {}
+        for key, demographics in jobs.items():
+            if demographics is None:
+                continue
+            age, gender, ethnicity = demographics
+            request = playlist_request(age, gender, ethnicity)
+            futures[pool.submit(_generate_with_retries, model, request, limiter, retries, backoff)] = key
+
+        for future in as_completed(futures):
+            key = futures[future]
+            try:
+                playlist = future.result()
+            except Exception as e:
+                errors.append(f"{key}: {e}")
+                continue
+            try:
+                playlist_cache.put(key, playlist)
+            except sqlite3.Error as e:
+                # Keep prefetching; the playlist is generated again on demand
+                logger.warning("Could not cache playlist %s: %s", key, e)
+                errors.append(f"{key}: could not cache: {e}")
+                continue
+            generated += 1
+
+    seconds = time.perf_counter() - start
+    attempted = generated + len(errors)
+    return {
+        "demographics": len(jobs),
+        "cached": cached,
+        "generated": generated,
+        "errors": len(errors),
+        "error_rate": len(errors) / attempted if attempted else 0.0,
+        "seconds": seconds,
+        "playlists_per_second": generated / seconds if seconds else 0.0,
+        "error_messages": errors,
+    }
+
+def main():
+    import argparse
+
+    from database import migrate, fetch_patients
+
+    parser = argparse.ArgumentParser(description="Pre-generate playlists for every kūpuna demographic")
+    commands = parser.add_subparsers(dest="command", required=True)
+    prefetch = commands.add_parser("prefetch", help="fill the playlist cache from the patients table")
+    prefetch.add_argument("--workers", type=int, default=4)
+    prefetch.add_argument("--rate", type=float, default=2.0, help="model calls per second")
+    prefetch.add_argument("--retries", type=int, default=3)
+    args = parser.parse_args()
+
+    migrate()
+    report = prefetch_playlists(fetch_patients(), workers=args.workers, rate=args.rate, retries=args.retries)
+    for message in report["error_messages"]:
+        print(f"error: {message}")
+    print(f"{report['demographics']} demographics: {report['cached']} already cached, "
+          f"{report['generated']} generated, {report['errors']} failed "
+          f"in {report['seconds']:.1f}s ({report['playlists_per_second']:.1f}/s, "
+          f"error rate {report['error_rate']:.1%}) - cache {playlist_cache.stats()}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+import streamlit as st
+import os
+import json
+import time
+import hmac
+import base64
+import hashlib
+import secrets
+
+# Signs session tokens. Without it tokens only last as long as this process
+# and are not accepted by other server processes.
+SESSION_SECRET = os.getenv("SESSION_SECRET") or secrets.token_hex(32)
+SESSION_TTL = int(os.getenv("SESSION_TTL", str(12 * 60 * 60)))
+SESSION_COOKIE = "kupuna_session"
+# Deep links may carry the token as ?session=<token> instead of the cookie
+SESSION_PARAM = "session"
+
+COOKIE_SCRIPT = """<script>
+document.cookie = "{name}={value}; Max-Age={max_age}; Path=/; SameSite=Lax" + (location.protocol === "https:" ? "; Secure" : "");
+</script>"""
+
+def _encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+def _decode(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+def _sign(payload):
+    return _encode(hmac.new(SESSION_SECRET.encode(), payload.encode(), hashlib.sha256).digest())
+
+def issue_token(user_id, username, role, ttl=SESSION_TTL):
+    claims = {"uid": user_id, "sub": username, "role": role, "exp": int(time.time() + ttl)}
+    payload = _encode(json.dumps(claims, separators=(",", ":")).encode())
+    return f"{payload}.{_sign(payload)}"
+
+def verify_token(token):
+    """
+    Claims of a token with a valid signature that has not expired,
+    otherwise None.
+    """
+    try:
+        payload, signature = token.split(".")
+        if not hmac.compare_digest(signature, _sign(payload)):
+            return None
+        claims = json.loads(_decode(payload))
+    except (AttributeError, ValueError):
+        return None
+    return claims if claims.get("exp", 0) > time.time() else None
+
+def _open_session(claims, token, persist):
+    st.session_state["session"] = {
+        "user_id": claims["uid"],
+        "username": claims["sub"],
+        "role": claims["role"],
+        "expires": claims["exp"],
+    }
+    st.session_state["role"] = claims["role"]
+    if persist:
+        # Written to the browser by the next page that renders
+        st.session_state["session_cookie"] = (token, claims["exp"] - int(time.time()))
+
+def _write_cookie():
+    cookie = st.session_state.pop("session_cookie", None)
+    if cookie is not None:
+        token, max_age = cookie
+        st.html(COOKIE_SCRIPT.format(name=SESSION_COOKIE, value=token, max_age=max_age), unsafe_allow_javascript=True)
+
+def start_session(user):
+    """
+    Issue a signed token for a user row from auth.authenticate and keep it
+    in a cookie, so reloads and page links stay signed in.
+    """
+    token = issue_token(int(user["id"]), user["username"], user["role"])
+    # The login page switches pages right away; the next page sets the cookie
+    _open_session(verify_token(token), token, persist=True)
+
+def restore_session():
+    """
+    The signed-in user for this browser session: user_id, username, role
+    and expires. Restored from the session cookie or ?session= parameter
+    with one HMAC check and no database access. Returns None when signed out.
+    """
+    if "session" in st.session_state:
+        session = st.session_state["session"]
+        if session is not None and session["expires"] <= time.time():
+            # Expired while the page was open
+            session = st.session_state["session"] = None
+            st.session_state["role"] = None
+        _write_cookie()
+        return session
+
+    token = st.query_params.get(SESSION_PARAM)
+    from_link = token is not None
+    if from_link:
+        # Keep the token out of the address bar once it is in the cookie
+        del st.query_params[SESSION_PARAM]
+    else:
+        token = st.context.cookies.get(SESSION_COOKIE)
+
+    claims = verify_token(token) if token else None
+    if claims is None:
+        # The cookies do not change during a browser session; later reruns
+        # return from session_state without reading them again
+        st.session_state["session"] = None
+        return None
+    _open_session(claims, token, persist=from_link)
+    _write_cookie()
+    return st.session_state["session"]
+
+def end_session():
+    # Cookies in st.context are fixed for the connection, so state marks the
+    # sign-out; the cookie is cleared by the next restore_session()
+    st.session_state["session"] = None
+    st.session_state["role"] = None
+    st.session_state["session_cookie"] = ("", 0)
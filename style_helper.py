@@ -1,38 +1,132 @@
 import streamlit as st
 import os
 
-from streamlit_extras.stylable_container import stylable_container
-from streamlit_extras.bottom_container import bottom
+from assets import build_assets, style_fragment
+from session import restore_session
+from database import initialize_database
 
 STYLE_CSS = os.getenv('STYLE_CSS')
 
-def apply_header():
-  st.set_page_config(layout="wide", page_title="Kūpuna Care", page_icon="👵")  
-  st.markdown(STYLE_CSS, unsafe_allow_html=True)
-  
-  html_content = """<div class="e2_21">
+def header_fragment():
+  # Built once per process and reused on every rerun
+  return _header_fragment(STYLE_CSS)
+
+@st.cache_resource
+def _header_fragment(style_css):
+  header_image = build_assets(style_css)["hawaii.png"]
+  return style_fragment(style_css) + f"""<div class="e2_21">
       <div class="header-text-container">
           <div class="e1_15">KŪPUNA CARE</div>
           <div class="e2_23"></div>
           <div class="e2_22">Lōkahi Innovation</div>
       </div>
       <div class="header-image">
-          <img src="https://raw.githubusercontent.com/datjandra/kupuna/refs/heads/main/images/hawaii.png" alt="Header Image">
+          <img src="{header_image}" alt="Header Image">
       </div>
   </div>"""
-  st.markdown(html_content, unsafe_allow_html=True)
+
+def apply_header():
+  st.set_page_config(layout="wide", page_title="Kūpuna Care", page_icon="👵")  
+  # Stylesheet and header in one element; the footer no longer repeats the CSS
+  st.markdown(header_fragment(), unsafe_allow_html=True)
+
+# Navigation cards, by page name under pages/
+ROUTES = {
+  "member_info": {"label": "Member Info", "icon": "&#128117;"},
+  "create_routine": {"label": "Create Routine", "icon": "&#x1F57A;"},
+  "assign_routine": {"label": "Assign Routine", "icon": "&#128116;"},
+  "exercise_routines": {"label": "View Routines", "icon": "&#129488;"},
+  "exercise_log": {"label": "Exercise Log", "icon": "&#128200;"},
+  "virtual_garden": {"label": "Virtual Garden", "icon": "&#127802;"},
+  "dementia_info": {"label": "Dementia Info", "icon": "&#128106;"},
+}
+
+# Page titles and the cards each page links to by role; None is any other role
+PAGES = {
+  "member_info": {
+    "title": "Member Info",
+    "links": {None: ["create_routine", "assign_routine"]},
+  },
+  "create_routine": {
+    "title": "Create Exercise Routine",
+    "links": {None: ["member_info", "assign_routine", "exercise_routines"]},
+  },
+  "assign_routine": {
+    "title": "Assign Routine",
+    "links": {None: ["member_info", "create_routine", "exercise_routines"]},
+  },
+  "exercise_routines": {
+    "title": "Exercise Routines",
+    "links": {
+      "coach": ["create_routine", "assign_routine"],
+      "caregiver": ["exercise_log", "dementia_info"],
+      None: ["create_routine", "assign_routine", "exercise_log"],
+    },
+  },
+  "exercise_log": {
+    "title": "Exercise Log",
+    "links": {None: ["exercise_routines", "virtual_garden", "dementia_info"]},
+  },
+  "virtual_garden": {
+    "title": "Virtual Garden",
+    "links": {None: ["exercise_routines", "exercise_log"]},
+  },
+  "dementia_info": {
+    "title": "Understanding Dementia",
+    "links": {None: ["exercise_routines", "exercise_log"]},
+  },
+}
+
+def navigation_fragment(page, role=None):
+  links = PAGES[page]["links"]
+  cards = "".join(
+    f'<a href="{route}" target="_self" class="button-card"><p>{ROUTES[route]["label"]}</p><div class="icon">{ROUTES[route]["icon"]}</div></a>'
+    for route in links.get(role, links[None])
+  )
+  return f'<div class="button-grid">{cards}</div>'
+
+def page_shell(page, role=None):
+  # Roles without their own cards share the default shell
+  if role not in PAGES[page]["links"]:
+    role = None
+  return _page_shell(STYLE_CSS, page, role)
+
+@st.cache_resource
+def _page_shell(style_css, page, role):
+  return f"""{_header_fragment(style_css)}
+<h1>{PAGES[page]["title"]}</h1>
+{navigation_fragment(page, role)}"""
+
+def apply_page_shell(page):
+  """
+  Header, title and navigation cards for a page in pages/, built once per
+  page and role and sent as a single element, followed by the sidebar logo.
+  """
+  st.set_page_config(layout="wide", page_title="Kūpuna Care", page_icon="👵")
+  # Pages can be opened directly, before login.py has migrated the database;
+  # this runs once per process
+  initialize_database()
+  # Sets the role from the session token after a reload or page link
+  restore_session()
+  st.markdown(page_shell(page, st.session_state.get("role")), unsafe_allow_html=True)
+  apply_sidebar_logo()
+
+def apply_sidebar_logo():
+  logo = build_assets(STYLE_CSS)["logo.png"]
+  st.sidebar.markdown(f'<img src="{logo}" alt="Kūpuna Care" style="width: 100%;">', unsafe_allow_html=True)
 
 def apply_footer():  
-  st.markdown(STYLE_CSS, unsafe_allow_html=True)
-  
   html_content = """<div class="footer">
     <p>© 2024 Kūpuna Care.</p>
   </div>"""
 
-  with bottom():
+  with st.bottom:
     st.markdown(html_content, unsafe_allow_html=True)
 
 def card_container(key, content_func, *args, **kwargs):
+    # streamlit_extras is slow to import, so only pages with cards load it
+    from streamlit_extras.stylable_container import stylable_container
+
     # Create a container to group components
     with stylable_container(
         key=key,
@@ -0,0 +1,215 @@
+import streamlit as st
+import os
+import re
+import sys
+import html
+import json
+import threading
+import urllib.parse
+
+from string import Template
+
+from concurrent.futures import ThreadPoolExecutor
+
+from database import get_video_metadata, upsert_video_metadata
+from outbound import Upstream
+
+YOUTUBE_API_KEY = os.getenv('YOUTUBE_API_KEY')
+VIDEO_METADATA_TIMEOUT = float(os.getenv("VIDEO_METADATA_TIMEOUT", "5"))
+# Show a thumbnail and load the player only when it is clicked; "false" embeds every player
+LAZY_VIDEOS = os.getenv("LAZY_VIDEOS", "true").lower() != "false"
+VIDEO_EMBED_HEIGHT = int(os.getenv("VIDEO_EMBED_HEIGHT", "260"))
+
+YOUTUBE_ID_PATTERN = re.compile(r"(?:youtube(?:-nocookie)?\.com/(?:watch\?(?:.*&)?v=|embed/|shorts/|live/)|youtu\.be/)([A-Za-z0-9_-]{11})")
+ISO_DURATION_PATTERN = re.compile(r"P(?:(\d+)D)?T?(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?")
+
+metadata_upstream = Upstream("video metadata", VIDEO_METADATA_TIMEOUT)
+
+# Background refreshes of missing metadata, at most one per video at a time
+_refresh_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="video-metadata")
+_pending = set()
+_pending_lock = threading.Lock()
+
+def youtube_id(url):
+    match = YOUTUBE_ID_PATTERN.search(url or "")
+    return match.group(1) if match else None
+
+def thumbnail_url(video_id):
+    return f"https://i.ytimg.com/vi/{video_id}/hqdefault.jpg"
+
+def format_duration(seconds):
+    if not seconds:
+        return ""
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+def _parse_iso_duration(value):
+    match = ISO_DURATION_PATTERN.fullmatch(value or "")
+    if not match:
+        return None
+    days, hours, minutes, seconds = (int(part or 0) for part in match.groups())
+    return ((days * 24 + hours) * 60 + minutes) * 60 + seconds
+
+def _fetch_data_api(video_ids):
+    # Title and duration for up to 50 videos per request
+    import requests
+
+    response = requests.get(
+        "https://www.googleapis.com/youtube/v3/videos",
+        params={"part": "snippet,contentDetails", "id": ",".join(video_ids), "key": YOUTUBE_API_KEY},
+        timeout=VIDEO_METADATA_TIMEOUT,
+    )
+    response.raise_for_status()
+    return [
+        (item["id"], item["snippet"]["title"], _parse_iso_duration(item["contentDetails"]["duration"]), thumbnail_url(item["id"]))
+        for item in response.json().get("items", [])
+    ]
+
+def _fetch_oembed(video_id):
+    # No key needed, but oEmbed has no duration
+    import requests
+
+    response = requests.get(
+        "https://www.youtube.com/oembed",
+        params={"url": f"https://www.youtube.com/watch?v={video_id}", "format": "json"},
+        timeout=VIDEO_METADATA_TIMEOUT,
+    )
+    response.raise_for_status()
+    return (video_id, response.json().get("title"), None, thumbnail_url(video_id))
+
+def fetch_video_metadata(video_ids):
+    """
+    Look up title and duration for the given YouTube IDs and store them.
+    Uses the Data API when YOUTUBE_API_KEY is set, otherwise oEmbed.
+    Videos that cannot be looked up are skipped. Returns the stored rows.
+    """
+    rows = []
+    video_ids = list(video_ids)
+    if YOUTUBE_API_KEY:
+        for start in range(0, len(video_ids), 50):
+            try:
+                rows += metadata_upstream.call(_fetch_data_api, video_ids[start:start + 50])
+            except Exception:
+                continue
+    else:
+        for video_id in video_ids:
+            try:
+                rows.append(metadata_upstream.call(_fetch_oembed, video_id))
+            except Exception:
+                continue
+    if rows:
+        upsert_video_metadata(rows)
+    return rows
+
+def _refresh(video_ids):
+    try:
+        fetch_video_metadata(video_ids)
+    finally:
+        with _pending_lock:
+            _pending.difference_update(video_ids)
+
+def video_details(urls):
+    """
+    Return {url: {video_id, title, duration, thumbnail_url}} for YouTube
+    URLs; other URLs are left out. Stored metadata is used when present,
+    and missing videos are looked up in the background for later runs.
+    """
+    if not LAZY_VIDEOS:
+        # Every video gets its player, so nothing to look up
+        return {}
+
+    ids = {url: youtube_id(url) for url in urls}
+    ids = {url: video_id for url, video_id in ids.items() if video_id}
+    stored = get_video_metadata(ids.values())
+
+    with _pending_lock:
+        missing = {video_id for video_id in ids.values() if video_id not in stored} - _pending
+        _pending.update(missing)
+    if missing:
+        _refresh_pool.submit(_refresh, missing)
+
+    details = {}
+    for url, video_id in ids.items():
+        metadata = stored.get(video_id, {})
+        details[url] = {
+            "video_id": video_id,
+            "title": metadata.get("title"),
+            "duration": format_duration(metadata.get("duration_seconds")),
+            "thumbnail_url": metadata.get("thumbnail_url") or thumbnail_url(video_id),
+        }
+    return details
+
+VIDEO_CARD_CSS = Template("""
+.video-card{position:relative;height:${height}px;cursor:pointer;border-radius:8px;overflow:hidden;background:#000 center/cover;font:14px sans-serif}
+.video-card b{position:absolute;top:50%;left:50%;transform:translate(-50%,-50%);padding:12px 24px;border-radius:12px;background:#c00e;color:#fff}
+.video-card p{position:absolute;bottom:0;left:0;right:0;margin:0;display:flex;justify-content:space-between;gap:8px;padding:6px 10px;background:#0009;color:#fff}
+.video-player{width:100%;height:${height}px;border:0;border-radius:8px}
+""")
+
+# Installs the card styles and one click handler for every card, once per
+# browser page. A click swaps the card for the YouTube iframe without a rerun.
+VIDEO_CARD_SCRIPT = Template("""<script>
+window.kupunaVideoCards||(window.kupunaVideoCards=1,
+document.head.appendChild(Object.assign(document.createElement("style"),{textContent:${css}})),
+document.addEventListener("click",function(e){var c=e.target.closest&&e.target.closest(".video-card");if(!c)return;var f=document.createElement("iframe");f.className="video-player";f.src="https://www.youtube-nocookie.com/embed/"+c.dataset.video+"?autoplay=1";f.allow="autoplay;encrypted-media;picture-in-picture;fullscreen";c.replaceWith(f)}))
+</script>""")
+
+VIDEO_CARD_TEMPLATE = Template("""<div class="video-card" data-video="${video_id}" role="button" aria-label="Play ${title}" style="background-image:url(${thumbnail})"><b>&#9654;</b><p><span>${title}</span><span>${duration}</span></p></div>""")
+
+# Each script run has its own thread, so this marks whether the current run
+# has sent the card script yet
+_run = threading.local()
+
+@st.cache_resource
+def video_card_script():
+    return VIDEO_CARD_SCRIPT.substitute(css=json.dumps(VIDEO_CARD_CSS.substitute(height=VIDEO_EMBED_HEIGHT)))
+
+def video_embed(url, title=None, details=None, player=st.video):
+    """
+    Show a video as a thumbnail with its title and duration. The YouTube
+    player is only created when the thumbnail is clicked. URLs that are not
+    YouTube videos, or LAZY_VIDEOS=false, go straight to player.
+    """
+    if LAZY_VIDEOS and details is None:
+        details = video_details([url]).get(url)
+    if not LAZY_VIDEOS or details is None:
+        player(url)
+        return
+
+    # Title and thumbnail come from YouTube, so they are escaped before embedding
+    card = VIDEO_CARD_TEMPLATE.substitute(
+        video_id=details["video_id"],
+        thumbnail=html.escape(urllib.parse.quote(details["thumbnail_url"], safe=":/?&=%#+,;@!$*"), quote=True),
+        title=html.escape(details["title"] or title or ""),
+        duration=html.escape(details["duration"]),
+    )
+    if not getattr(_run, "script_sent", False):
+        # Sent with the first card of the run; later cards are plain markup
+        card = video_card_script() + card
+        _run.script_sent = True
+    st.html(card, unsafe_allow_javascript=True)
+
+def main():
+    """
+    Fetch metadata for every exercise and catalog video that has none:
+
+        python videos.py refresh
+    """
+    from database import initialize_database, get_all_exercises
+
+    if sys.argv[1:] != ["refresh"]:
+        print(main.__doc__)
+        return
+
+    initialize_database()
+    urls = [exercise["video"] for lengths in get_all_exercises().values() for phases in lengths.values()
+            for exercises in phases.values() for exercise in exercises]
+    urls += [f"https://www.youtube.com/watch?v={video_id}" for video_id in json.loads(os.getenv("YOUTUBE_LINKS", "{}")).values()]
+    video_ids = {youtube_id(url) for url in urls} - {None}
+    missing = video_ids - set(get_video_metadata(video_ids))
+    rows = fetch_video_metadata(sorted(missing))
+    print(f"{len(video_ids)} videos, {len(missing)} without metadata, {len(rows)} fetched")
+
+if __name__ == "__main__":
+    main()